@@ -0,0 +1,69 @@
+"""Сравнение двух прогонов бенчмарков.
+
+python benchmarks/compare.py results/old.json results/new.json
+
+Регрессией считается рост p95 больше чем на --threshold процентов
+или любой рост числа запросов к БД. При регрессиях код выхода 1.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries')
+
+
+def load(path):
+    with open(path, encoding='utf-8') as results:
+        return json.load(results)
+
+
+def regressions(old, new, threshold):
+    for name, after in sorted(new['views'].items()):
+        before = old['views'].get(name)
+        if before is None:
+            continue
+        if after['queries'] > before['queries']:
+            yield name, 'queries', before['queries'], after['queries']
+        if after['p95_ms'] > before['p95_ms'] * (1 + threshold / 100):
+            yield name, 'p95_ms', before['p95_ms'], after['p95_ms']
+
+
+def table(old, new):
+    header = ['view', *METRICS]
+    rows = [header]
+    for name, after in sorted(new['views'].items()):
+        before = old['views'].get(name, {})
+        rows.append([name] + [
+            f'{before.get(metric, "—")} → {after[metric]}'
+            for metric in METRICS
+        ])
+    widths = [max(len(row[column]) for row in rows)
+              for column in range(len(header))]
+    return '\n'.join(
+        '  '.join(cell.ljust(width) for cell, width in zip(row, widths))
+        for row in rows
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument(
+        '--threshold', type=float, default=20,
+        help='Допустимый рост p95 в процентах',
+    )
+    args = parser.parse_args(argv)
+    old, new = load(args.old), load(args.new)
+    if old['dataset'] != new['dataset']:
+        print('Внимание: прогоны сделаны на разных объёмах данных')
+    print(f'{old["commit"]} → {new["commit"]}')
+    print(table(old, new))
+    found = list(regressions(old, new, args.threshold))
+    for name, metric, before, after in found:
+        print(f'Регрессия {name}: {metric} {before} → {after}')
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
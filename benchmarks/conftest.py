@@ -0,0 +1,4 @@
+pytest_plugins = [
+    'benchmarks.fixtures.fixture_dataset',
+    'benchmarks.fixtures.fixture_report',
+]
@@ -0,0 +1,46 @@
+import os
+from io import StringIO
+from types import SimpleNamespace
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from posts.models import Group, Post, Tag, User
+
+FULL_SCALE = {
+    'users': 5000,
+    'groups': 1000,
+    'posts': 200000,
+    'comments': 300000,
+}
+
+
+def seed(scale=0.05, random_seed=0):
+    sizes = {
+        name: max(int(value * scale), 2)
+        for name, value in FULL_SCALE.items()
+    }
+    call_command(
+        'seed_yatube',
+        follows_per_user=50,
+        seed=random_seed,
+        stdout=StringIO(),
+        **sizes,
+    )
+    cache.clear()
+    post = Post.objects.select_related('author').latest('pub_date')
+    return SimpleNamespace(
+        sizes=sizes,
+        user=User.objects.order_by('pk').first(),
+        author=post.author,
+        group=Group.objects.order_by('pk').first(),
+        post=post,
+        tag=Tag.objects.order_by('pk').first().name,
+    )
+
+
+@pytest.fixture(scope='session')
+def dataset(django_db_setup, django_db_blocker):
+    scale = float(os.environ.get('BENCHMARK_SCALE', 0.05))
+    with django_db_blocker.unblock():
+        return seed(scale)
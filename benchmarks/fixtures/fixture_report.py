@@ -0,0 +1,40 @@
+import json
+import os
+import platform
+import subprocess
+
+import django
+import pytest
+from django.utils import timezone
+
+BENCHMARKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=BENCHMARKS_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+@pytest.fixture(scope='session')
+def report(dataset):
+    """Результаты прогона, записываемые в JSON в конце сессии."""
+    results = {}
+    yield results
+    commit = current_commit()
+    path = os.environ.get('BENCHMARK_OUTPUT') or os.path.join(
+        BENCHMARKS_DIR, 'results', f'{commit}.json'
+    )
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump({
+            'commit': commit,
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'dataset': dataset.sizes,
+            'views': dict(sorted(results.items())),
+        }, output, ensure_ascii=False, indent=2)
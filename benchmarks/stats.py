@@ -0,0 +1,21 @@
+import statistics
+
+
+def summarize(timings, queries, statuses):
+    """Перцентили задержки в миллисекундах и запросы к БД на запрос."""
+    warm = sorted(timings[1:] or timings)
+    if len(warm) > 1:
+        centiles = statistics.quantiles(warm, n=100, method='inclusive')
+    else:
+        centiles = warm * 99
+    return {
+        'status': sorted(set(statuses)),
+        'requests': len(timings),
+        'cold_ms': round(timings[0] * 1000, 3),
+        'p50_ms': round(centiles[49] * 1000, 3),
+        'p95_ms': round(centiles[94] * 1000, 3),
+        'p99_ms': round(centiles[98] * 1000, 3),
+        'mean_ms': round(statistics.mean(warm) * 1000, 3),
+        'rps': round(len(warm) / sum(warm), 1),
+        'queries': max(queries),
+    }
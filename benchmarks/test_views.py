@@ -0,0 +1,112 @@
+"""Задержка и число запросов для каждого адреса posts, users и about.
+
+Запуск: pytest benchmarks
+Размер данных задаёт BENCHMARK_SCALE (1.0 — полный объём), число
+повторов — BENCHMARK_ITERATIONS. Результаты пишутся в
+benchmarks/results/<commit>.json, сравнение — benchmarks/compare.py.
+"""
+import os
+import time
+
+import pytest
+from about import urls as about_urls
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.test import Client
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from posts import urls as posts_urls
+from users import urls as users_urls
+
+from .stats import summarize
+
+ITERATIONS = int(os.environ.get('BENCHMARK_ITERATIONS', 30))
+
+URL_MODULES = (posts_urls, users_urls, about_urls)
+
+
+def reset_token(data):
+    return [
+        urlsafe_base64_encode(force_bytes(data.user.pk)),
+        default_token_generator.make_token(data.user),
+    ]
+
+
+# Для каждого адреса: аргументы, метод, данные формы и чьими глазами
+# смотрим страницу (None — гость, 'user' — читатель, 'author' — автор).
+SCENARIOS = {
+    'posts:index': {},
+    'posts:post_create': {'login': 'user'},
+    'posts:follow_index': {'login': 'user'},
+    'posts:group_list': {'args': lambda data: [data.group.slug]},
+    'posts:post_search': {'params': {'q': 'набережная кофе'}},
+    'posts:tag_posts': {'args': lambda data: [data.tag]},
+    'posts:post_detail': {'args': lambda data: [data.post.pk]},
+    'posts:post_comments': {'args': lambda data: [data.post.pk]},
+    'posts:post_edit': {
+        'args': lambda data: [data.post.pk], 'login': 'author',
+    },
+    'posts:add_comment': {
+        'args': lambda data: [data.post.pk],
+        'method': 'post',
+        'params': {'text': 'Комментарий для замера'},
+        'login': 'user',
+    },
+    'posts:profile': {'args': lambda data: [data.author.username]},
+    'posts:mentions': {'args': lambda data: [data.author.username]},
+    'posts:profile_follow': {
+        'args': lambda data: [data.author.username], 'login': 'user',
+    },
+    'posts:profile_unfollow': {
+        'args': lambda data: [data.author.username], 'login': 'user',
+    },
+    'users:login': {},
+    'users:logout': {'login': 'user'},
+    'users:password_change': {'login': 'user'},
+    'users:password_change_done': {'login': 'user'},
+    'users:password_reset': {},
+    'users:password_reset_done': {},
+    'users:password_reset_confirm': {'args': reset_token},
+    'users:password_reset_complete': {},
+    'users:signup': {},
+    'about:author': {},
+    'about:tech': {},
+}
+
+
+def url_names():
+    return [
+        f'{module.app_name}:{pattern.name}'
+        for module in URL_MODULES
+        for pattern in module.urlpatterns
+    ]
+
+
+def test_every_url_has_scenario():
+    """Новые адреса не выпадают из замеров"""
+    assert sorted(url_names()) == sorted(SCENARIOS)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', url_names())
+def test_view(name, dataset, report):
+    scenario = SCENARIOS[name]
+    args = scenario.get('args', lambda data: [])(dataset)
+    url = reverse(name, args=args)
+    login = scenario.get('login')
+    client = Client()
+    send = getattr(client, scenario.get('method', 'get'))
+    cache.clear()
+    timings, queries, statuses = [], [], []
+    for _ in range(ITERATIONS):
+        if login:
+            # Вход заново: выход из аккаунта тоже входит в замеры.
+            client.force_login(getattr(dataset, login))
+        start = time.perf_counter()
+        response = send(url, scenario.get('params', {}))
+        timings.append(time.perf_counter() - start)
+        queries.append(response.query_stats['queries'])
+        statuses.append(response.status_code)
+    assert all(status < 500 for status in statuses)
+    report[name] = summarize(timings, queries, statuses)
@@ -0,0 +1,81 @@
+"""Представление моделей в JSON для read-only API.
+
+Сериализатор — это набор именованных полей; клиент может запросить
+только часть из них параметром ?fields=id,text.
+"""
+
+
+class FieldError(ValueError):
+    pass
+
+
+class Serializer:
+    fields = {}
+
+    def __init__(self, requested=None):
+        if not requested:
+            self.selected = list(self.fields)
+            return
+        self.selected = [name for name in requested.split(',') if name]
+        unknown = [name for name in self.selected if name not in self.fields]
+        if unknown:
+            raise FieldError(
+                'Неизвестные поля: {}. Доступны: {}'.format(
+                    ', '.join(unknown), ', '.join(self.fields)
+                )
+            )
+
+    def to_dict(self, obj):
+        return {name: self.fields[name](obj) for name in self.selected}
+
+    def to_list(self, objects):
+        return [self.to_dict(obj) for obj in objects]
+
+
+def _group_slug(post):
+    return post.group.slug if post.group_id else None
+
+
+def _image_url(post):
+    return post.image.url if post.image else None
+
+
+class PostSerializer(Serializer):
+    fields = {
+        'id': lambda post: post.pk,
+        'text': lambda post: post.text,
+        'pub_date': lambda post: post.pub_date.isoformat(),
+        'author': lambda post: post.author.username,
+        'group': _group_slug,
+        'image': _image_url,
+        'comments_count': lambda post: post.comments_count,
+    }
+
+
+class CommentSerializer(Serializer):
+    fields = {
+        'id': lambda comment: comment.pk,
+        'post': lambda comment: comment.post_id,
+        'author': lambda comment: comment.author.username,
+        'text': lambda comment: comment.text,
+        'created': lambda comment: comment.created.isoformat(),
+    }
+
+
+class GroupSerializer(Serializer):
+    fields = {
+        'slug': lambda group: group.slug,
+        'title': lambda group: group.title,
+        'description': lambda group: group.description,
+    }
+
+
+class ProfileSerializer(Serializer):
+    fields = {
+        'username': lambda user: user.username,
+        'full_name': lambda user: user.get_full_name(),
+        'posts_count': lambda user: user.stats.posts_count,
+        'comments_count': lambda user: user.stats.comments_count,
+        'followers_count': lambda user: user.stats.followers_count,
+        'following_count': lambda user: user.stats.following_count,
+    }
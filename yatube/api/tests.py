@@ -0,0 +1,178 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import ImmediateOnCommitMixin, QueryBudgetTestMixin
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(ImmediateOnCommitMixin, QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='test-title',
+            slug='test-slug',
+            description='test-description',
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'test-text {number}',
+                author=cls.author,
+                group=cls.group,
+            )
+            for number in range(3)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='test-comment'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.authorized = Client()
+        self.authorized.force_login(self.reader)
+
+    def test_endpoints(self):
+        """Все адреса API отдают JSON в пределах бюджета запросов"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        urls = (
+            reverse('api:post_list'),
+            reverse('api:post_detail', args=[self.posts[0].pk]),
+            reverse('api:post_comments', args=[self.posts[0].pk]),
+            reverse('api:group_list'),
+            reverse('api:group_posts', args=[self.group.slug]),
+            reverse('api:profile_detail', args=[self.author.username]),
+            reverse('api:profile_posts', args=[self.author.username]),
+            reverse('api:follow_feed'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertIn('ETag', response)
+                self.assertIn('Last-Modified', response)
+                self.assertWithinQueryBudget(response)
+
+    def test_post_detail(self):
+        """Пост отдаётся со всеми полями"""
+        post = self.posts[0]
+        response = self.guest.get(reverse('api:post_detail', args=[post.pk]))
+        self.assertEqual(response.json(), {
+            'id': post.pk,
+            'text': post.text,
+            'pub_date': post.pub_date.isoformat(),
+            'author': 'author',
+            'group': 'test-slug',
+            'image': None,
+            'comments_count': 1,
+        })
+
+    def test_profile_detail(self):
+        """Профиль содержит счётчики автора"""
+        response = self.guest.get(
+            reverse('api:profile_detail', args=[self.author.username])
+        )
+        self.assertEqual(response.json()['full_name'], 'Лев Толстой')
+        self.assertEqual(response.json()['posts_count'], 3)
+
+    def test_sparse_fields(self):
+        """Параметр fields оставляет только запрошенные поля"""
+        response = self.guest.get(
+            reverse('api:post_list'), {'fields': 'id,author'}
+        )
+        self.assertEqual(
+            response.json()['results'][0],
+            {'id': self.posts[-1].pk, 'author': 'author'},
+        )
+
+    def test_unknown_field(self):
+        """Неизвестное поле даёт ошибку 400"""
+        response = self.guest.get(reverse('api:post_list'), {'fields': 'x'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('detail', response.json())
+
+    def test_not_found(self):
+        """Отсутствующий объект даёт JSON с кодом 404"""
+        response = self.guest.get(reverse('api:post_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'detail': 'Не найдено'})
+
+    @override_settings(POSTS_PER_PAGE=2)
+    def test_cursor_pagination(self):
+        """Лента листается курсорами next и previous"""
+        first = self.guest.get(
+            reverse('api:post_list'), {'fields': 'id'}
+        ).json()
+        self.assertEqual(
+            first['results'],
+            [{'id': self.posts[2].pk}, {'id': self.posts[1].pk}],
+        )
+        self.assertIsNone(first['previous'])
+        self.assertIn('fields=id', first['next'])
+        second = self.guest.get(first['next']).json()
+        self.assertEqual(second['results'], [{'id': self.posts[0].pk}])
+        self.assertIsNone(second['next'])
+        back = self.guest.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_not_modified_without_queries(self):
+        """Повторный запрос с ETag получает 304 без обращения к БД"""
+        url = reverse('api:post_list')
+        etag = self.guest.get(url)['ETag']
+        self.assertTrue(etag.startswith('"'))
+        with self.assertNumQueries(0):
+            response = self.guest.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_if_modified_since(self):
+        """Last-Modified поддерживает If-Modified-Since"""
+        url = reverse('api:group_list')
+        last_modified = self.guest.get(url)['Last-Modified']
+        response = self.guest.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes(self):
+        """ETag меняется при изменении данных ленты"""
+        changes = (
+            lambda: Post.objects.create(text='new', author=self.author),
+            lambda: Comment.objects.create(
+                post=self.posts[1], author=self.reader, text='new'
+            ),
+            lambda: Follow.objects.create(
+                user=self.reader, author=self.author
+            ),
+        )
+        url = reverse('api:profile_detail', args=[self.author.username])
+        for change in changes:
+            with self.subTest(change=change):
+                etag = self.guest.get(url)['ETag']
+                change()
+                response = self.guest.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_follow_feed(self):
+        """Лента подписок доступна только авторизованному пользователю"""
+        url = reverse('api:follow_feed')
+        response = self.guest.get(url)
+        self.assertEqual(response.status_code, 401)
+        self.assertNotIn('ETag', response)
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.authorized.get(url)
+        self.assertEqual(len(response.json()['results']), 3)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_read_only(self):
+        """API не принимает изменяющие запросы"""
+        response = self.authorized.post(reverse('api:post_list'))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,170 @@
+from functools import wraps
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import urlencode
+from django.views.decorators.http import require_safe
+
+from posts import feed_cache, timeline
+from posts.http_cache import (feed_condition, fresh_reads,
+                              request_version_keys)
+from posts.models import Group, Post, User
+from posts.paginators import CursorPaginator
+
+from .serializers import (CommentSerializer, FieldError, GroupSerializer,
+                          PostSerializer, ProfileSerializer)
+
+PUBLIC_KEYS = (feed_cache.version_key(feed_cache.INDEX),)
+PROFILE_KEYS = PUBLIC_KEYS + (feed_cache.version_key(feed_cache.FOLLOW),)
+
+
+def error(detail, status):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def public_keys(request, *args, **kwargs):
+    return PUBLIC_KEYS
+
+
+def profile_keys(request, *args, **kwargs):
+    return PROFILE_KEYS
+
+
+def follow_keys(request):
+    if not request.user.is_authenticated:
+        return None
+    return PUBLIC_KEYS + (
+        feed_cache.version_key(feed_cache.FOLLOW, request.user.pk),
+    )
+
+
+def api_view(version_keys, private=False):
+    """Read-only представление API с условными GET-запросами."""
+    def decorator(view):
+        keys = request_version_keys(version_keys)
+        conditional = require_safe(
+            fresh_reads(keys)(feed_condition(keys)(view))
+        )
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                response = conditional(request, *args, **kwargs)
+            except Http404:
+                response = error('Не найдено', 404)
+            except FieldError as field_error:
+                response = error(str(field_error), 400)
+            if private:
+                patch_cache_control(response, private=True, no_cache=True)
+                patch_vary_headers(response, ('Cookie',))
+            else:
+                patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def page_url(request, **cursor):
+    params = {
+        name: value for name, value in request.GET.items()
+        if name not in ('after', 'before')
+    }
+    params.update(cursor)
+    return request.build_absolute_uri(
+        '{}?{}'.format(request.path, urlencode(params))
+    )
+
+
+def paginated_response(request, queryset, serializer, per_page,
+                       ordering=('-pub_date', '-pk')):
+    paginator = CursorPaginator(queryset, per_page, ordering)
+    page = paginator.get_cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    return JsonResponse({
+        'results': serializer.to_list(page),
+        'next': paginator.next_cursor and page_url(
+            request, after=paginator.next_cursor
+        ),
+        'previous': paginator.previous_cursor and page_url(
+            request, before=paginator.previous_cursor
+        ),
+    })
+
+
+def post_list_response(request, queryset, ordering=('-pub_date', '-pk')):
+    serializer = PostSerializer(request.GET.get('fields'))
+    return paginated_response(
+        request,
+        queryset.select_related('author', 'group'),
+        serializer,
+        settings.POSTS_PER_PAGE,
+        ordering,
+    )
+
+
+@api_view(public_keys)
+def post_list(request):
+    return post_list_response(request, Post.objects.all())
+
+
+@api_view(public_keys)
+def post_detail(request, post_id):
+    serializer = PostSerializer(request.GET.get('fields'))
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
+    return JsonResponse(serializer.to_dict(post))
+
+
+@api_view(public_keys)
+def post_comments(request, post_id):
+    serializer = CommentSerializer(request.GET.get('fields'))
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return paginated_response(
+        request,
+        post.comments.select_related('author'),
+        serializer,
+        settings.COMMENTS_PER_PAGE,
+        ('created', 'pk'),
+    )
+
+
+@api_view(public_keys)
+def group_list(request):
+    serializer = GroupSerializer(request.GET.get('fields'))
+    groups = Group.objects.order_by('title', 'pk')
+    return JsonResponse({'results': serializer.to_list(groups)})
+
+
+@api_view(public_keys)
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return post_list_response(request, group.posts.all())
+
+
+@api_view(profile_keys)
+def profile_detail(request, username):
+    serializer = ProfileSerializer(request.GET.get('fields'))
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    return JsonResponse(serializer.to_dict(author))
+
+
+@api_view(public_keys)
+def profile_posts(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return post_list_response(request, author.posts.all())
+
+
+@api_view(follow_keys, private=True)
+def follow_feed(request):
+    if not request.user.is_authenticated:
+        return error('Требуется авторизация', 401)
+    return post_list_response(
+        request, timeline.follow_feed(request.user), timeline.FEED_ORDERING
+    )
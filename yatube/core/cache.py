@@ -0,0 +1,188 @@
+"""Двухуровневый кэш: память процесса перед общим кэшем.
+
+Общий кэш (псевдоним OPTIONS['SHARED'] в CACHES) видят все процессы,
+поэтому версии и счётчики лент хранятся только в нём, и их изменение
+сразу доходит до каждого процесса. В память процесса попадают ключи
+с префиксами из OPTIONS['LOCAL_PREFIXES'], значение которых под тем же
+именем не меняется: новая версия даёт новый ключ, а старые записи
+вытесняются по LRU или истекают через LOCAL_TIMEOUT секунд. delete
+таких ключей очищает память только текущего процесса.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MISSING = object()
+
+
+class LocalTier:
+    """LRU в памяти процесса со сроком жизни записей."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+        # Значения хранятся сериализованными, как в LocMemCache, чтобы
+        # изменение полученного объекта не меняло кэш.
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout):
+        if timeout <= 0:
+            self.delete(key)
+            return
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TieredCache(BaseCache):
+    """Бэкенд кэша: LocalTier перед кэшем OPTIONS['SHARED'].
+
+    KEY_PREFIX и VERSION задаются у общего кэша.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options['SHARED']
+        self.local_prefixes = tuple(options.get('LOCAL_PREFIXES', ()))
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 300)
+        self.local = LocalTier(options.get('LOCAL_MAX_ENTRIES', 1000))
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def is_local(self, key):
+        return (
+            self.local.max_entries > 0
+            and key.startswith(self.local_prefixes)
+        )
+
+    def local_key(self, key, version):
+        return self.shared.make_key(key, version=version)
+
+    def get_local_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.shared.default_timeout
+        if timeout is None:
+            return self.local_timeout
+        return min(timeout, self.local_timeout)
+
+    def get(self, key, default=None, version=None):
+        if not self.is_local(key):
+            return self.shared.get(key, default, version=version)
+        local_key = self.local_key(key, version)
+        value = self.local.get(local_key)
+        if value is MISSING:
+            value = self.shared.get(key, MISSING, version=version)
+            if value is MISSING:
+                return default
+            self.local.set(local_key, value, self.local_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        for key in keys:
+            if self.is_local(key):
+                value = self.local.get(self.local_key(key, version))
+                if value is not MISSING:
+                    found[key] = value
+        missing = [key for key in keys if key not in found]
+        if missing:
+            values = self.shared.get_many(missing, version=version)
+            for key, value in values.items():
+                if self.is_local(key):
+                    self.local.set(
+                        self.local_key(key, version), value,
+                        self.local_timeout,
+                    )
+            found.update(values)
+        return found
+
+    def has_key(self, key, version=None):
+        if (
+            self.is_local(key)
+            and self.local.get(self.local_key(key, version)) is not MISSING
+        ):
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        if self.is_local(key):
+            self.local.set(
+                self.local_key(key, version), value,
+                self.get_local_timeout(timeout),
+            )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added and self.is_local(key):
+            self.local.set(
+                self.local_key(key, version), value,
+                self.get_local_timeout(timeout),
+            )
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        local_timeout = self.get_local_timeout(timeout)
+        for key, value in data.items():
+            if self.is_local(key) and key not in failed:
+                self.local.set(
+                    self.local_key(key, version), value, local_timeout
+                )
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        if self.is_local(key):
+            self.local.delete(self.local_key(key, version))
+        return self.shared.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        if self.is_local(key):
+            self.local.delete(self.local_key(key, version))
+        return self.shared.incr(key, delta, version=version)
+
+    def delete(self, key, version=None):
+        if self.is_local(key):
+            self.local.delete(self.local_key(key, version))
+        self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        for key in keys:
+            if self.is_local(key):
+                self.local.delete(self.local_key(key, version))
+        self.shared.delete_many(keys, version=version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
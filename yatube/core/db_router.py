@@ -0,0 +1,72 @@
+"""Чтение лент из реплик, запись — в основную базу.
+
+ReplicaRoutingMiddleware отправляет в реплику только чтения
+представлений из settings.DATABASE_REPLICA_VIEWS. Запросы с записью,
+остальные представления, команды и фоновые задачи работают с основной
+базой. Одна реплика выбирается на весь HTTP-запрос, чтобы страница
+читалась из одного снимка данных. Запрос, который что-то записал
+в базу, отмечается, и middleware закрепляет клиента за основной базой.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRIMARY = 'default'
+
+_read_alias = ContextVar('read_alias', default=PRIMARY)
+
+_wrote = ContextVar('wrote', default=False)
+
+
+def choose_replica():
+    replicas = settings.DATABASE_REPLICAS
+    return random.choice(replicas) if replicas else PRIMARY
+
+
+def set_read_alias(alias):
+    return _read_alias.set(alias)
+
+
+def reset_read_alias(token):
+    _read_alias.reset(token)
+
+
+@contextmanager
+def read_from(alias):
+    token = set_read_alias(alias)
+    try:
+        yield alias
+    finally:
+        reset_read_alias(token)
+
+
+def read_alias():
+    return _read_alias.get()
+
+
+def track_writes():
+    return _wrote.set(False)
+
+
+def stop_tracking_writes(token):
+    wrote = _wrote.get()
+    _wrote.reset(token)
+    return wrote
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
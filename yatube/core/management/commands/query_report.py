@@ -0,0 +1,57 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.query_budget import get_budget, read_report
+
+
+class Command(BaseCommand):
+    help = 'Сводка SQL-запросов по представлениям из QUERY_REPORT_FILE'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=settings.QUERY_REPORT_FILE,
+            help='Файл отчёта QueryBudgetMiddleware',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Завершиться с ошибкой, если бюджет запросов превышен',
+        )
+
+    def handle(self, *args, path, check, **options):
+        if not path:
+            raise CommandError('Укажите файл отчёта или QUERY_REPORT_FILE')
+        views = defaultdict(list)
+        for stats in read_report(path):
+            views[stats['view']].append(stats)
+        over_budget = []
+        self.stdout.write(
+            f'{"view":<28}{"requests":>9}{"avg q":>7}{"max q":>7}'
+            f'{"dup":>6}{"sql ms":>9}{"render ms":>11}{"budget":>8}'
+        )
+        for view, requests in sorted(views.items()):
+            count = len(requests)
+            max_queries = max(stats['queries'] for stats in requests)
+            budget = get_budget(view)
+            if budget is not None and max_queries > budget:
+                over_budget.append(view)
+            line = (
+                f'{view:<28}{count:>9}'
+                f'{sum(s["queries"] for s in requests) / count:>7.1f}'
+                f'{max_queries:>7}'
+                f'{sum(s["duplicates"] for s in requests) / count:>6.1f}'
+                f'{sum(s["sql_ms"] for s in requests) / count:>9.2f}'
+                f'{sum(s["render_ms"] for s in requests) / count:>11.2f}'
+                f'{"-" if budget is None else budget:>8}'
+            )
+            if view in over_budget:
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+        if check and over_budget:
+            raise CommandError(
+                'Превышен бюджет запросов: ' + ', '.join(over_budget)
+            )
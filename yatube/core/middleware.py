@@ -0,0 +1,95 @@
+import logging
+import time
+
+from django.conf import settings
+
+from . import db_router
+from .query_budget import (QueryBudgetExceeded, check_budget, record_queries,
+                           write_report_line)
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetMiddleware:
+    """Считает SQL-запросы и время каждого запроса к представлению.
+
+    Статистика сохраняется в response.query_stats, в режиме DEBUG
+    отдаётся заголовками X-Query-*, а при заданном QUERY_REPORT_FILE
+    дописывается в отчёт для команды query_report.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        total_time = time.perf_counter() - start
+        match = request.resolver_match
+        stats = {
+            'view': match.view_name if match else request.path,
+            'queries': len(recorder.queries),
+            'duplicates': recorder.duplicates,
+            'sql_ms': round(recorder.sql_time * 1000, 3),
+            'render_ms': round((total_time - recorder.sql_time) * 1000, 3),
+        }
+        response.query_stats = stats
+        if settings.DEBUG:
+            response['X-Query-Count'] = stats['queries']
+            response['X-Query-Duplicates'] = stats['duplicates']
+            response['X-Query-Time'] = stats['sql_ms']
+            response['X-Render-Time'] = stats['render_ms']
+        write_report_line(stats)
+        try:
+            check_budget(stats)
+        except QueryBudgetExceeded as error:
+            if settings.QUERY_BUDGET_STRICT:
+                raise
+            logger.warning(error)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Направляет чтения представлений лент в реплики.
+
+    После запроса, который записал что-то в базу, в том числе GET
+    вроде profile_follow, клиент получает cookie и следующие
+    settings.DATABASE_PRIMARY_STICKY_SECONDS секунд читает из основной
+    базы, поэтому сразу видит свой пост, комментарий или подписку.
+    """
+
+    COOKIE_NAME = 'read_primary'
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        write_token = db_router.track_writes()
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = db_router.stop_tracking_writes(write_token)
+            token = getattr(request, '_read_alias_token', None)
+            if token is not None:
+                db_router.reset_read_alias(token)
+        if wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                self.COOKIE_NAME,
+                '1',
+                max_age=settings.DATABASE_PRIMARY_STICKY_SECONDS,
+                httponly=True,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in self.SAFE_METHODS
+            and self.COOKIE_NAME not in request.COOKIES
+            and request.resolver_match.view_name
+            in settings.DATABASE_REPLICA_VIEWS
+        ):
+            request._read_alias_token = db_router.set_read_alias(
+                db_router.choose_replica()
+            )
@@ -0,0 +1,71 @@
+import json
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper, запоминающая SQL-запросы и их время."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                (sql, repr(params), time.perf_counter() - start)
+            )
+
+    @property
+    def sql_time(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    @property
+    def duplicates(self):
+        counts = Counter((sql, params) for sql, params, _ in self.queries)
+        return sum(count - 1 for count in counts.values())
+
+
+@contextmanager
+def record_queries():
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+
+
+def get_budget(view_name):
+    return settings.QUERY_BUDGETS.get(view_name)
+
+
+def check_budget(stats):
+    budget = get_budget(stats['view'])
+    if budget is not None and stats['queries'] > budget:
+        raise QueryBudgetExceeded(
+            f'{stats["view"]}: {stats["queries"]} запросов '
+            f'при бюджете {budget}'
+        )
+
+
+def write_report_line(stats):
+    if settings.QUERY_REPORT_FILE:
+        with open(settings.QUERY_REPORT_FILE, 'a') as report:
+            report.write(json.dumps(stats) + '\n')
+
+
+def read_report(path):
+    with open(path) as report:
+        for line in report:
+            if line.strip():
+                yield json.loads(line)
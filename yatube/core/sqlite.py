@@ -0,0 +1,75 @@
+"""Режим производительности SQLite.
+
+Каждое новое соединение получает PRAGMA из settings.SQLITE_PRAGMAS:
+WAL позволяет читать во время записи, busy_timeout заставляет ждать
+блокировку вместо немедленной ошибки. Запись в базу из представлений
+оборачивается в serialized_write: внутри процесса записи идут
+по одной, а транзакция, упавшая с «database is locked» из-за писателя
+из другого процесса, повторяется целиком. Проверка форм, обработка
+картинок и рендер выполняются вне обёртки. Изменения вне базы
+(кэш лент) должны выполняться через transaction.on_commit, чтобы
+откаченная попытка их не оставила.
+"""
+import random
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+from django.conf import settings
+from django.db import (DEFAULT_DB_ALIAS, OperationalError, connections,
+                       transaction)
+
+_write_lock = threading.RLock()
+
+LOCKED_MESSAGES = ('database is locked', 'database table is locked')
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """Обработчик connection_created."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked_error(error):
+    return any(message in str(error) for message in LOCKED_MESSAGES)
+
+
+def serialized_write(view=None, using=DEFAULT_DB_ALIAS):
+    """Выполняет запись в транзакции с повтором при блокировке SQLite.
+
+    На других базах представление вызывается как есть.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            connection = connections[using]
+            # Во внешней транзакции повтор невозможен: её снимок уже
+            # устарел, повторять должен тот, кто её открыл.
+            if connection.vendor != 'sqlite' or connection.in_atomic_block:
+                return func(*args, **kwargs)
+            attempts = settings.SQLITE_WRITE_RETRIES + 1
+            for attempt in range(attempts):
+                try:
+                    with _serialized(), transaction.atomic(using=using):
+                        return func(*args, **kwargs)
+                except OperationalError as error:
+                    if not is_locked_error(error) or attempt == attempts - 1:
+                        raise
+                time.sleep(
+                    settings.SQLITE_RETRY_DELAY * 2 ** attempt
+                    * random.uniform(0.5, 1.5)
+                )
+        return wrapper
+    if view is not None:
+        return decorator(view)
+    return decorator
+
+
+def _serialized():
+    if settings.SQLITE_SERIALIZE_WRITES:
+        return _write_lock
+    return nullcontext()
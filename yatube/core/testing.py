@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.test import override_settings
+
+from .query_budget import get_budget
+
+
+class QueryBudgetTestMixin:
+    """Проверки бюджета запросов для TestCase.
+
+    Пока тест выполняется, превышение бюджета в QueryBudgetMiddleware
+    поднимает QueryBudgetExceeded и роняет тест.
+    """
+
+    def _pre_setup(self):
+        super()._pre_setup()
+        self._strict_budget = override_settings(QUERY_BUDGET_STRICT=True)
+        self._strict_budget.enable()
+
+    def _post_teardown(self):
+        self._strict_budget.disable()
+        super()._post_teardown()
+
+    def assertWithinQueryBudget(self, response):
+        stats = response.query_stats
+        budget = get_budget(stats['view'])
+        self.assertIsNotNone(
+            budget, f'Для {stats["view"]} не задан QUERY_BUDGETS'
+        )
+        self.assertLessEqual(stats['queries'], budget, stats)
+
+
+class FileDatabaseTestMixin:
+    """Дополнительная база SQLite в файле для TransactionTestCase.
+
+    Псевдоним file_database добавляется в connections до проверки
+    cls.databases и удаляется после тестов класса.
+    """
+
+    file_database = 'file'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.file_database_directory = tempfile.mkdtemp()
+        connections.databases[cls.file_database] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.file_database_directory, 'db.sqlite3'),
+        }
+        connections.ensure_defaults(cls.file_database)
+        connections.prepare_test_settings(cls.file_database)
+        super().setUpClass()
+        call_command('migrate', database=cls.file_database, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[cls.file_database].close()
+        del connections.databases[cls.file_database]
+        if hasattr(connections._connections, cls.file_database):
+            delattr(connections._connections, cls.file_database)
+        shutil.rmtree(cls.file_database_directory, ignore_errors=True)
+
+
+def immediate_on_commit():
+    """Подмена transaction.on_commit, выполняющая функцию сразу."""
+    return mock.patch.object(
+        transaction, 'on_commit', lambda func, using=None: func()
+    )
+
+
+class ImmediateOnCommitMixin:
+    """Выполняет transaction.on_commit сразу, как при автофиксации.
+
+    TestCase держит каждый тест в транзакции, которая не фиксируется,
+    поэтому без подмены изменения кэша после записи не произошли бы.
+    """
+
+    def _pre_setup(self):
+        super()._pre_setup()
+        self._on_commit = immediate_on_commit()
+        self._on_commit.start()
+
+    def _post_teardown(self):
+        self._on_commit.stop()
+        super()._post_teardown()
@@ -1,4 +1,30 @@
-from django.test import TestCase, Client
+import os
+import tempfile
+import threading
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connections
+from django.test import (Client, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from posts import feed_cache, feed_counts
+from posts.models import Post, Tag
+from yatube.caches import CacheConfigError, caches_from_env, parse_cache_url
+from yatube.databases import (DatabaseConfigError, databases_from_env,
+                              parse_database_url)
+
+from . import db_router
+from .cache import TieredCache
+from .middleware import ReplicaRoutingMiddleware
+from .query_budget import QueryBudgetExceeded
+from .sqlite import serialized_write
+from .testing import FileDatabaseTestMixin
+
+User = get_user_model()
 
 
 class CoreURLTest(TestCase):
@@ -8,3 +34,379 @@ class CoreURLTest(TestCase):
     def test_404_error_used_correct_template(self):
         response = self.guest.get('/error/error/')
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class QueryBudgetMiddlewareTest(TestCase):
+    def setUp(self):
+        self.guest = Client()
+
+    def test_query_stats(self):
+        """Статистика запросов привязывается к имени URL"""
+        response = self.guest.get('/')
+        stats = response.query_stats
+        self.assertEqual(stats['view'], 'posts:index')
+        self.assertGreaterEqual(stats['queries'], 1)
+        self.assertNotIn('X-Query-Count', response)
+
+    @override_settings(DEBUG=True)
+    def test_debug_headers(self):
+        """В режиме DEBUG статистика отдаётся заголовками"""
+        response = self.guest.get('/')
+        for header in (
+            'X-Query-Count',
+            'X-Query-Duplicates',
+            'X-Query-Time',
+            'X-Render-Time',
+        ):
+            with self.subTest(header=header):
+                self.assertIn(header, response)
+
+    @override_settings(
+        QUERY_BUDGETS={'posts:index': 0}, QUERY_BUDGET_STRICT=True
+    )
+    def test_strict_budget(self):
+        """Превышение бюджета в строгом режиме роняет запрос"""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.guest.get('/')
+
+    def test_query_report(self):
+        """Команда query_report сводит отчёт по представлениям"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'queries.jsonl')
+            with override_settings(QUERY_REPORT_FILE=path):
+                self.guest.get('/')
+                self.guest.get('/')
+            out = StringIO()
+            call_command('query_report', path, stdout=out)
+            self.assertRegex(out.getvalue(), r'posts:index\s+2\s')
+            with override_settings(QUERY_BUDGETS={'posts:index': 0}):
+                with self.assertRaises(CommandError):
+                    call_command('query_report', path, '--check',
+                                 stdout=StringIO())
+
+
+class DatabaseConfigTest(SimpleTestCase):
+    def test_postgres_url(self):
+        """Адрес PostgreSQL разбирается в настройки Django"""
+        config = parse_database_url(
+            'postgres://user:p%40ss@db:5433/yatube?sslmode=require'
+        )
+        self.assertEqual(config, {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': 'yatube',
+            'USER': 'user',
+            'PASSWORD': 'p@ss',
+            'HOST': 'db',
+            'PORT': '5433',
+            'CONN_MAX_AGE': 60,
+            'OPTIONS': {'sslmode': 'require'},
+        })
+
+    def test_conn_max_age(self):
+        """Время жизни соединения задаётся окружением"""
+        url = 'postgres://db/yatube'
+        self.assertEqual(parse_database_url(url, '0')['CONN_MAX_AGE'], 0)
+        self.assertIsNone(parse_database_url(url, '')['CONN_MAX_AGE'])
+        with self.assertRaises(DatabaseConfigError):
+            parse_database_url(url, 'forever')
+
+    def test_pgbouncer_pool(self):
+        """Через pgbouncer серверные курсоры отключаются"""
+        config = parse_database_url('postgres://db/yatube', pool='pgbouncer')
+        self.assertTrue(config['DISABLE_SERVER_SIDE_CURSORS'])
+        with self.assertRaises(DatabaseConfigError):
+            parse_database_url('postgres://db/yatube', pool='pgpool')
+
+    def test_unknown_scheme(self):
+        """Неизвестная схема адреса отклоняется"""
+        with self.assertRaises(DatabaseConfigError):
+            parse_database_url('oracle://db/yatube')
+
+    def test_sqlite_default(self):
+        """Без DATABASE_URL используется SQLite"""
+        databases, replicas = databases_from_env(
+            {}, 'sqlite:////srv/yatube/db.sqlite3'
+        )
+        self.assertEqual(databases, {'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': '/srv/yatube/db.sqlite3',
+            'CONN_MAX_AGE': 0,
+        }})
+        self.assertEqual(replicas, [])
+
+    def test_replicas(self):
+        """Реплики получают свои псевдонимы и зеркалят default в тестах"""
+        databases, replicas = databases_from_env({
+            'DATABASE_URL': 'postgres://primary/yatube',
+            'DATABASE_REPLICA_URLS': 'postgres://r1/yatube, postgres://r2/y',
+        }, 'sqlite:///db.sqlite3')
+        self.assertEqual(replicas, ['replica1', 'replica2'])
+        self.assertEqual(databases['replica2']['HOST'], 'r2')
+        self.assertEqual(
+            databases['replica1']['TEST'], {'MIRROR': 'default'}
+        )
+
+
+class CacheConfigTest(SimpleTestCase):
+    def test_cache_urls(self):
+        """Адрес общего кэша разбирается в настройки Django"""
+        self.assertEqual(parse_cache_url('file:///var/tmp/yatube'), {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': '/var/tmp/yatube',
+        })
+        self.assertEqual(
+            parse_cache_url('memcached://127.0.0.1:11211')['LOCATION'],
+            '127.0.0.1:11211',
+        )
+        for url in ('mongodb://db/cache', 'file://'):
+            with self.subTest(url=url):
+                with self.assertRaises(CacheConfigError):
+                    parse_cache_url(url)
+
+    def test_tiered_default(self):
+        """По умолчанию TieredCache стоит перед памятью процесса"""
+        caches = caches_from_env({'CACHE_LOCAL_MAX_ENTRIES': '10'})
+        self.assertEqual(
+            caches['default']['BACKEND'], 'core.cache.TieredCache'
+        )
+        self.assertEqual(
+            caches['default']['OPTIONS']['LOCAL_MAX_ENTRIES'], 10
+        )
+        self.assertEqual(
+            caches['shared']['BACKEND'],
+            'django.core.cache.backends.locmem.LocMemCache',
+        )
+        with self.assertRaises(CacheConfigError):
+            caches_from_env({'CACHE_LOCAL_MAX_ENTRIES': 'many'})
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tiered-test',
+    },
+})
+class TieredCacheTest(SimpleTestCase):
+    """Два процесса: у каждого своя память, общий кэш один."""
+
+    def setUp(self):
+        self.workers = [self.worker(), self.worker()]
+        self.workers[0].clear()
+
+    def worker(self, max_entries=100):
+        return TieredCache('', {'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_PREFIXES': ('template.cache.',),
+            'LOCAL_MAX_ENTRIES': max_entries,
+        }})
+
+    def test_local_tier(self):
+        """Ключи с локальным префиксом читаются из памяти процесса"""
+        first, second = self.workers
+        first.set('template.cache.index_page.1', 'лента')
+        first.set('feed_count:global', 3)
+        self.assertEqual(second.get('template.cache.index_page.1'), 'лента')
+        first.shared.clear()
+        self.assertEqual(first.get('template.cache.index_page.1'), 'лента')
+        self.assertEqual(second.get_many(['template.cache.index_page.1']), {
+            'template.cache.index_page.1': 'лента',
+        })
+        self.assertIsNone(first.get('feed_count:global'))
+
+    def test_version_invalidation(self):
+        """Смена версии в одном процессе видна во всех"""
+        first, second = self.workers
+        key = feed_cache.version_key(feed_cache.INDEX)
+        first.set(key, 1, None)
+        self.assertEqual(second.get(key), 1)
+        first.incr(key)
+        self.assertEqual(second.get(key), 2)
+        self.assertNotIn(key, second.local._data.keys())
+
+    def test_lru_eviction(self):
+        """Память процесса вытесняет давно не использованные ключи"""
+        worker = self.worker(max_entries=2)
+        for number in range(3):
+            worker.set(f'template.cache.page.{number}', number)
+        worker.get('template.cache.page.1')
+        worker.set('template.cache.page.3', 3)
+        self.assertEqual(len(worker.local._data), 2)
+        worker.shared.clear()
+        self.assertIsNone(worker.get('template.cache.page.2'))
+        self.assertEqual(worker.get('template.cache.page.1'), 1)
+
+    def test_timeouts(self):
+        """Нулевой срок не оставляет значение в памяти процесса"""
+        worker = self.workers[0]
+        worker.set('template.cache.page.1', 'страница', 0)
+        self.assertIsNone(worker.get('template.cache.page.1'))
+        self.assertFalse(worker.has_key('template.cache.page.1'))
+
+    def test_delete_and_clear(self):
+        """delete и clear очищают оба уровня"""
+        worker = self.workers[0]
+        worker.set_many({'template.cache.a': 1, 'template.cache.b': 2})
+        worker.delete('template.cache.a')
+        self.assertIsNone(worker.get('template.cache.a'))
+        worker.clear()
+        self.assertEqual(worker.get_many(['template.cache.b']), {})
+
+
+class ReplicaRouterTest(FileDatabaseTestMixin, TransactionTestCase):
+    """Маршрутизация между основной базой и репликой на двух SQLite."""
+
+    file_database = 'replica1'
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.client = Client()
+        self.client.force_login(self.user)
+        replica_user = User(pk=self.user.pk, username='auth')
+        User.objects.using('replica1').bulk_create([replica_user])
+        Post.objects.using('replica1').bulk_create([
+            Post(text='Пост из реплики', author=replica_user),
+        ])
+
+    def test_router(self):
+        """Чтения идут в выбранную базу, записи — всегда в основную"""
+        self.assertEqual(Post.objects.all().db, 'default')
+        with db_router.read_from('replica1'):
+            self.assertEqual(Post.objects.all().db, 'replica1')
+            self.assertEqual(Post.objects.count(), 1)
+            self.assertEqual(
+                db_router.ReplicaRouter().db_for_write(Post), 'default'
+            )
+        self.assertEqual(Post.objects.count(), 0)
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_replicas_are_not_migrated(self):
+        """Миграции применяются только к основной базе"""
+        router = db_router.ReplicaRouter()
+        self.assertFalse(router.allow_migrate('replica1', 'posts'))
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+
+    @override_settings(
+        DATABASE_REPLICAS=['replica1'], DATABASE_REPLICA_LAG_SECONDS=0
+    )
+    def test_feed_reads_from_replica(self):
+        """Ленты читаются из реплики"""
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'Пост из реплики')
+
+    def test_without_replicas(self):
+        """Без реплик всё читается из основной базы"""
+        response = Client().get(reverse('posts:index'))
+        self.assertNotContains(response, 'Пост из реплики')
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_write_then_read_primary(self):
+        """После записи клиент читает свою запись из основной базы"""
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.assertIn(ReplicaRoutingMiddleware.COOKIE_NAME, response.cookies)
+        self.assertTrue(Post.objects.filter(text='Новый пост').exists())
+        self.assertFalse(
+            Post.objects.using('replica1').filter(text='Новый пост').exists()
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Новый пост')
+        self.assertNotContains(response, 'Пост из реплики')
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_get_write_then_read_primary(self):
+        """Подписка через GET тоже закрепляет клиента за основной базой"""
+        author = User.objects.create_user(username='author')
+        response = self.client.get(
+            reverse('posts:profile_follow', args=[author.username])
+        )
+        self.assertIn(ReplicaRoutingMiddleware.COOKIE_NAME, response.cookies)
+        response = Client().get(reverse('posts:index'))
+        self.assertNotIn(
+            ReplicaRoutingMiddleware.COOKIE_NAME, response.cookies
+        )
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_changed_feed_reads_primary(self):
+        """Недавно изменённая лента читается из основной базы"""
+        feed_cache.bump_versions([feed_cache.version_key(feed_cache.INDEX)])
+        response = Client().get(reverse('posts:index'))
+        self.assertNotContains(response, 'Пост из реплики')
+
+
+class SQLiteWriteTest(FileDatabaseTestMixin, TransactionTestCase):
+    """PRAGMA и конкурентная запись в файловую базу SQLite."""
+
+    file_database = 'concurrency'
+    databases = {'default', 'concurrency'}
+
+    def pragma(self, name):
+        with connections[self.file_database].cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        """Новое соединение получает PRAGMA из настроек"""
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('synchronous'), 1)
+
+    def write_concurrently(self, threads=8, writes=10):
+        errors = []
+
+        @serialized_write(using=self.file_database)
+        def create_tag(name):
+            tags = Tag.objects.using(self.file_database)
+            tags.count()
+            tags.create(name=name)
+
+        def worker(number):
+            try:
+                for index in range(writes):
+                    create_tag(f'тема{number}-{index}')
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        workers = [
+            threading.Thread(target=worker, args=(number,))
+            for number in range(threads)
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            Tag.objects.using(self.file_database).count(), threads * writes
+        )
+
+    def test_concurrent_writes(self):
+        """Параллельные записи не падают с «database is locked»"""
+        for serialize in (True, False):
+            with self.subTest(serialize=serialize):
+                Tag.objects.using(self.file_database).all().delete()
+                with override_settings(SQLITE_SERIALIZE_WRITES=serialize):
+                    self.write_concurrently()
+
+    @override_settings(SQLITE_RETRY_DELAY=0)
+    def test_retry_changes_cache_once(self):
+        """Повтор транзакции не повторяет изменения кэша"""
+        key = feed_counts.feed_key(feed_counts.GLOBAL)
+        cache.set(key, 0)
+        attempts = []
+
+        @serialized_write
+        def write():
+            feed_counts.change_counts([key], 1)
+            attempts.append(True)
+            if len(attempts) == 1:
+                raise OperationalError('database is locked')
+
+        write()
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(cache.get(key), 1)
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Follow, Group, Post
 
 
@@ -12,6 +13,11 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search.search_posts(search_term, queryset), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
@@ -0,0 +1,96 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Сигналы меняют счётчики атомарно через F-выражения, а команда
+recount_counters пересчитывает их по таблицам и исправляет расхождения.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+USER_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'comments_count': (Comment, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def _count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount_user_stats(user_id):
+    return {
+        name: model.objects.filter(**{f'{field}_id': user_id}).count()
+        for name, (model, field) in USER_COUNTERS.items()
+    }
+
+
+def change_user_stats(user_id, **deltas):
+    updated = UserStats.objects.filter(user_id=user_id).update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+    # Строки нет при уменьшении, когда пользователь удаляется каскадно:
+    # создавать её заново нельзя.
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        UserStats.objects.get_or_create(
+            user_id=user_id, defaults=recount_user_stats(user_id)
+        )
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def repair_user_stats(batch_size=1000):
+    """Пересчитывает счётчики пользователей, возвращает число исправлений."""
+    users = User.objects.annotate(**{
+        f'actual_{name}': _count_subquery(model, field)
+        for name, (model, field) in USER_COUNTERS.items()
+    }).select_related('stats')
+    missing, drifted = [], []
+    for user in users.iterator():
+        actual = {
+            name: getattr(user, f'actual_{name}') for name in USER_COUNTERS
+        }
+        try:
+            stats = user.stats
+        except UserStats.DoesNotExist:
+            missing.append(UserStats(user=user, **actual))
+            continue
+        if any(getattr(stats, name) != value
+               for name, value in actual.items()):
+            for name, value in actual.items():
+                setattr(stats, name, value)
+            drifted.append(stats)
+    UserStats.objects.bulk_create(missing)
+    UserStats.objects.bulk_update(
+        drifted, list(USER_COUNTERS), batch_size=batch_size
+    )
+    return len(missing) + len(drifted)
+
+
+def repair_comments_counts(batch_size=1000):
+    """Пересчитывает счётчики комментариев постов."""
+    drifted = []
+    posts = Post.objects.annotate(
+        actual=_count_subquery(Comment, 'post')
+    ).exclude(comments_count=F('actual')).only('pk', 'comments_count')
+    for post in posts.iterator():
+        post.comments_count = post.actual
+        drifted.append(post)
+    Post.objects.bulk_update(drifted, ['comments_count'], batch_size)
+    return len(drifted)
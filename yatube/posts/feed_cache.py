@@ -0,0 +1,109 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+INDEX = 'index'
+GROUP = 'group'
+AUTHOR = 'author'
+FOLLOW = 'follow'
+POST = 'post'
+
+
+def version_key(kind, pk=None):
+    if pk is None:
+        return f'feed_version:{kind}'
+    return f'feed_version:{kind}:{pk}'
+
+
+def _initial_version():
+    # Версия после вытеснения из кэша должна быть больше любой прежней,
+    # иначе снова станут доступны устаревшие фрагменты.
+    return int(time.time() * 1000)
+
+
+def get_versions(keys):
+    versions = cache.get_many(keys)
+    missing = {
+        key: _initial_version() for key in keys if key not in versions
+    }
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def modified_key(key):
+    return key.replace('feed_version:', 'feed_modified:', 1)
+
+
+def bump_versions(keys):
+    """Меняет версии лент после фиксации транзакции.
+
+    Иначе читатель успел бы закэшировать ещё старые данные под новой
+    версией, а повтор транзакции сдвинул бы версию лишний раз.
+    """
+    keys = set(keys)
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+    now = time.time()
+    cache.set_many({modified_key(key): now for key in keys}, None)
+
+
+def get_last_modified(keys):
+    """Время последнего изменения любой из лент keys (timestamp)."""
+    modified = cache.get_many([modified_key(key) for key in keys])
+    missing = {
+        modified_key(key): time.time()
+        for key in keys
+        if modified_key(key) not in modified
+    }
+    if missing:
+        cache.set_many(missing, None)
+        modified.update(missing)
+    return max(modified.values())
+
+
+def post_version_keys(post, group_ids=()):
+    keys = [
+        version_key(INDEX),
+        version_key(AUTHOR, post.author_id),
+        version_key(POST, post.pk),
+    ]
+    keys.extend(
+        version_key(GROUP, group_id)
+        for group_id in {post.group_id, *group_ids}
+        if group_id
+    )
+    return keys
+
+
+def fragment_context(keys, page):
+    """Параметры тега {% cache %} для списка постов ленты.
+
+    Версии разных лент могут совпасть, поэтому ключ фрагмента включает
+    имена версий. Страница задаётся проверенным номером или постами,
+    которые на ней оказались, а не параметрами запроса: мусорные page,
+    after и before не создают новых записей в кэше.
+    """
+    if page.number is not None:
+        page_key = f'number:{page.number}'
+    else:
+        # Посты страницы по курсору уже загружены пагинатором.
+        page_key = 'posts:' + ','.join(
+            str(post.pk) for post in page.object_list
+        )
+    return {
+        'timeout': settings.FEED_CACHE_TIMEOUT,
+        'feed': ','.join(keys),
+        'version': '.'.join(str(version) for version in get_versions(keys)),
+        'page': page_key,
+    }
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+GLOBAL = 'global'
+GROUP = 'group'
+AUTHOR = 'author'
+FOLLOW = 'follow'
+TAG = 'tag'
+MENTION = 'mention'
+
+
+def feed_key(kind, pk=None):
+    if pk is None:
+        return f'feed_count:{kind}'
+    return f'feed_count:{kind}:{pk}'
+
+
+def get_count(key, queryset):
+    """Число записей ленты из кэша; COUNT выполняется только при промахе."""
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.add(key, count, settings.FEED_COUNT_TIMEOUT)
+    return count
+
+
+def change_counts(keys, delta):
+    """Меняет закэшированные числа после фиксации транзакции.
+
+    Откаченная или повторённая транзакция не должна менять их дважды.
+    """
+    keys = list(keys)
+
+    def change():
+        for key in keys:
+            try:
+                cache.incr(key, delta)
+            except ValueError:
+                pass
+    transaction.on_commit(change)
+
+
+def reset_counts(keys):
+    keys = list(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def post_feed_keys(post, follower_ids=()):
+    keys = [feed_key(GLOBAL), feed_key(AUTHOR, post.author_id)]
+    if post.group_id:
+        keys.append(feed_key(GROUP, post.group_id))
+    keys.extend(feed_key(FOLLOW, user_id) for user_id in follower_ids)
+    return keys
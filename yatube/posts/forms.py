@@ -1,6 +1,10 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
 
 from .models import Comment, Post
+from .uploads import normalize_image, read_header
 
 
 class PostForm(forms.ModelForm):
@@ -9,6 +13,47 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image',)
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.image_oversized = getattr(
+            self.files.get('image'), 'oversized', False
+        )
+        if self.image_oversized:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if self.image_oversized:
+            raise forms.ValidationError(
+                'Файл больше %(limit)s',
+                code='file_too_large',
+                params={
+                    'limit': filesizeformat(settings.POST_IMAGE_MAX_BYTES),
+                },
+            )
+        if not isinstance(image, UploadedFile):
+            return image
+        header = read_header(image)
+        if header.animated:
+            raise forms.ValidationError(
+                'Анимированные изображения не поддерживаются',
+                code='animated_image',
+            )
+        if header.width * header.height > header.pixel_limit:
+            raise forms.ValidationError(
+                'Изображение больше %(limit)s мегапикселей',
+                code='too_many_pixels',
+                params={'limit': header.pixel_limit // 10 ** 6},
+            )
+        try:
+            return normalize_image(image)
+        except OSError as error:
+            raise forms.ValidationError(
+                'Не удалось обработать изображение',
+                code='invalid_image',
+            ) from error
+
 
 class CommentForm(forms.ModelForm):
 
@@ -0,0 +1,131 @@
+"""Условные ответы и заголовки кэширования для лент.
+
+ETag и Last-Modified строятся по версиям лент из feed_cache: версии
+меняются при любой правке постов, комментариев, групп и подписок,
+поэтому повторный запрос без изменений получает 304 без отрисовки
+шаблона. Время жизни ответа в общих кэшах задаётся по имени URL
+в settings.HTTP_CACHE_MAX_AGE.
+
+Запись меняет версию ленты сразу, а реплика получает данные позже.
+Страница, прочитанная из отстающей реплики, попала бы в кэш фрагментов
+и в ETag под новой версией и осталась бы там до следующего изменения.
+Поэтому settings.DATABASE_REPLICA_LAG_SECONDS секунд после изменения
+ленты её страницы читаются из основной базы; устаревшая страница
+возможна, только если версия изменится между этой проверкой и
+чтением версии при отрисовке.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from core import db_router
+
+from . import feed_cache
+
+
+def request_version_keys(version_keys):
+    """Ключи версий, вычисленные один раз на запрос."""
+    def keys(request, *args, **kwargs):
+        computed = request.__dict__.setdefault('_feed_version_keys', {})
+        if version_keys not in computed:
+            computed[version_keys] = version_keys(request, *args, **kwargs)
+        return computed[version_keys]
+    return keys
+
+
+def feed_etag(version_keys):
+    def etag(request, *args, **kwargs):
+        keys = version_keys(request, *args, **kwargs)
+        if keys is None:
+            return None
+        versions = feed_cache.get_versions(list(keys))
+        raw = '{}|{}'.format(
+            request.get_full_path(), '.'.join(map(str, versions))
+        )
+        return hashlib.md5(raw.encode()).hexdigest()
+    return etag
+
+
+def feed_last_modified(version_keys):
+    def last_modified(request, *args, **kwargs):
+        keys = version_keys(request, *args, **kwargs)
+        if keys is None:
+            return None
+        return datetime.fromtimestamp(
+            feed_cache.get_last_modified(list(keys)), timezone.utc
+        )
+    return last_modified
+
+
+def feed_condition(version_keys):
+    """Декоратор condition с валидаторами по версиям лент.
+
+    version_keys(request, *args, **kwargs) возвращает ключи версий
+    или None, если ответ не должен получать валидаторы.
+    """
+    keys = request_version_keys(version_keys)
+    return condition(
+        etag_func=feed_etag(keys), last_modified_func=feed_last_modified(keys)
+    )
+
+
+def is_recent(keys):
+    modified = feed_cache.get_last_modified(list(keys))
+    return time.time() - modified < settings.DATABASE_REPLICA_LAG_SECONDS
+
+
+def fresh_reads(version_keys):
+    """Читает недавно изменённые ленты из основной базы."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if db_router.read_alias() != db_router.PRIMARY:
+                keys = version_keys(request, *args, **kwargs)
+                if keys is not None and is_recent(keys):
+                    with db_router.read_from(db_router.PRIMARY):
+                        return view(request, *args, **kwargs)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_max_age(request):
+    match = request.resolver_match
+    return settings.HTTP_CACHE_MAX_AGE.get(match.view_name, 0) if match else 0
+
+
+def cache_policy(version_keys):
+    """Политика кэширования HTML-страницы ленты.
+
+    Анонимные ответы получают валидаторы и public с max-age из
+    настроек, страницы пользователя — private. Vary: Cookie отделяет
+    одни от других в общих кэшах.
+    """
+    keys = request_version_keys(version_keys)
+
+    def anonymous_keys(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        return keys(request, *args, **kwargs)
+
+    def decorator(view):
+        conditional = fresh_reads(keys)(feed_condition(anonymous_keys)(view))
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True)
+            else:
+                patch_cache_control(
+                    response, public=True, max_age=get_max_age(request)
+                )
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
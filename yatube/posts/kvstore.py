@@ -0,0 +1,105 @@
+"""Хранилище метаданных миниатюр sorl-thumbnail для лент постов.
+
+Поверх стандартного хранилища (кэш, затем база) добавлены выборка
+многих ключей за один cache.get_many и один запрос к базе, а также
+память процесса с вытеснением давно не использованных ключей. Ключ
+миниатюры зависит от имени исходного файла и параметров, поэтому
+найденное значение не устаревает; в памяти хранятся только найденные
+значения, чтобы готовые миниатюры сразу становились видны.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as BaseKVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class LRUCache:
+    def __init__(self):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > settings.THUMBNAIL_LRU_SIZE:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class KVStore(BaseKVStore):
+    memory = LRUCache()
+
+    def get_many(self, image_files):
+        """Словарь {ключ файла: ImageFile или None} для всех файлов."""
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        values = self._get_many_raw(keys)
+        return {
+            key: deserialize_image_file(values[raw_key])
+            if values.get(raw_key) else None
+            for raw_key, key in keys.items()
+        }
+
+    def _get_many_raw(self, keys):
+        values = {}
+        for key in keys:
+            value = self.memory.get(key)
+            if value is not None:
+                values[key] = value
+        missing = [key for key in keys if key not in values]
+        if missing:
+            values.update(self.cache.get_many(missing))
+        missing = [key for key in keys if key not in values]
+        if missing:
+            found = dict(
+                KVStoreModel.objects.filter(key__in=missing)
+                .values_list('key', 'value')
+            )
+            self.cache.set_many(
+                {key: found.get(key, EMPTY_VALUE) for key in missing},
+                thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT,
+            )
+            values.update(found)
+        for key, value in values.items():
+            if value == EMPTY_VALUE:
+                values[key] = None
+            else:
+                self.memory.set(key, value)
+        return values
+
+    def _get_raw(self, key):
+        return self._get_many_raw([key]).get(key)
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self.memory.set(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        for key in keys:
+            self.memory.delete(key)
+
+    def clear(self, delete_thumbnails=False):
+        super().clear(delete_thumbnails)
+        self.memory.clear()
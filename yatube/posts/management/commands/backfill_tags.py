@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from posts import tags
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Разбирает теги и упоминания в уже опубликованных постах'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько постов обрабатывать за один проход',
+        )
+
+    def handle(self, *args, batch_size, **options):
+        processed = 0
+        last_pk = 0
+        while True:
+            posts = list(
+                Post.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .only('text', 'pub_date')[:batch_size]
+            )
+            if not posts:
+                break
+            tags.sync_posts(posts)
+            processed += len(posts)
+            last_pk = posts[-1].pk
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано постов: {processed}'
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Удаляет картинки постов, на которые не ссылается ни один пост'
+
+    def handle(self, *args, **options):
+        removed = thumbnails.sweep()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено изображений: {removed}'
+        ))
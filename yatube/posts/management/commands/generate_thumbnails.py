@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие миниатюры изображений постов'
+
+    def handle(self, *args, **options):
+        created = 0
+        images = (
+            Post.objects.exclude(image='')
+            .values_list('image', flat=True)
+            .distinct()
+            .iterator()
+        )
+        for name in images:
+            if None in thumbnails.get_thumbnails([name])[name].values():
+                thumbnails.generate(name)
+                created += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {created}'
+        ))
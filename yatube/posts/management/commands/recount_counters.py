@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк обновлять одним запросом',
+        )
+
+    def handle(self, *args, batch_size, **options):
+        users = counters.repair_user_stats(batch_size)
+        posts = counters.repair_comments_counts(batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков пользователей: {users}, '
+            f'постов: {posts}'
+        ))
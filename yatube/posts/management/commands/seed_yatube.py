@@ -0,0 +1,372 @@
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from io import BytesIO
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from posts import counters, feed_cache, feed_counts, search, tags, timeline
+from posts.models import Comment, Follow, Group, Post, Tag, User
+from posts.storage import post_image_storage
+
+START = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+WORDS = (
+    'лето', 'город', 'кофе', 'прогулка', 'набережная', 'книга', 'кот',
+    'поезд', 'море', 'дождь', 'работа', 'музыка', 'вечер', 'друзья',
+    'утро', 'парк', 'фото', 'выходные', 'дорога', 'снег', 'чай', 'кино',
+)
+
+TAGS_BATCH_SIZE = 500
+
+LOOKUP_BATCH_SIZE = 500
+
+TAG_NAMES = tuple(f'тема{number}' for number in range(100))
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def popularity(count, alpha, rng):
+    """Накопленные веса закона Ципфа в случайном порядке рангов."""
+    ranks = list(range(count))
+    rng.shuffle(ranks)
+    return list(accumulate(1 / (rank + 1) ** alpha for rank in ranks))
+
+
+def next_pk(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями и подписками. Число постов, комментариев и '
+        'подписок на пользователя распределено по степенному закону.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=40000)
+        parser.add_argument(
+            '--follows-per-user',
+            type=float,
+            default=20,
+            help='Примерное среднее число подписок пользователя',
+        )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=1.5,
+            help='Показатель степенного закона, больше 1',
+        )
+        parser.add_argument(
+            '--images',
+            type=float,
+            default=0,
+            help='Доля постов с картинкой, от 0 до 1',
+        )
+        parser.add_argument(
+            '--image-pool',
+            type=int,
+            default=20,
+            help='Сколько различных картинок сгенерировать',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='За сколько дней от 2021-01-01 распределить посты',
+        )
+        parser.add_argument(
+            '--password',
+            help='Пароль всех созданных пользователей; без него '
+                 'войти под ними нельзя',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Сколько строк записывать в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+        if options['alpha'] <= 1:
+            raise CommandError('--alpha должен быть больше 1')
+        if not 0 <= options['images'] <= 1:
+            raise CommandError('--images задаётся долей от 0 до 1')
+        if options['users'] < 2:
+            raise CommandError('Нужно хотя бы два пользователя')
+        started = time.monotonic()
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        users = self.new_pks(User, options['users'])
+        groups = self.new_pks(Group, options['groups'])
+        self.check_collisions(users, groups)
+        self.users = self.create_users(users)
+        self.groups = self.create_groups(groups)
+        self.posts, self.post_dates = self.create_posts()
+        comments = self.create_comments()
+        follows = self.create_follows()
+        self.reset_sequences()
+        self.rebuild_derived_data()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(self.users)}, '
+            f'групп: {len(self.groups)}, постов: {len(self.posts)}, '
+            f'комментариев: {comments}, подписок: {follows} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
+
+    def new_pks(self, model, count):
+        first = next_pk(model)
+        return range(first, first + count)
+
+    def check_collisions(self, users, groups):
+        """Проверяет имена до записи, чтобы не оставить часть данных."""
+        for model, field, values in (
+            (User, 'username', [self.username(pk) for pk in users]),
+            (Group, 'slug', [self.slug(pk) for pk in groups]),
+        ):
+            for chunk in chunks(values, LOOKUP_BATCH_SIZE):
+                taken = model.objects.filter(
+                    **{f'{field}__in': chunk}
+                ).values_list(field, flat=True).first()
+                if taken is not None:
+                    raise CommandError(f'{taken!r} уже занято')
+
+    def reset_sequences(self):
+        """Сдвигает счётчики id после вставки строк с явными pk."""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [User, Group, Post, Comment]
+        )
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    def insert(self, model, objects, date_field=None, **kwargs):
+        """Записывает объекты пачками, каждую в своей транзакции.
+
+        Поле date_field с auto_now_add bulk_create заполняет текущим
+        временем, поэтому даты из прошлого записываются после вставки.
+        """
+        created = 0
+        for chunk in chunks(objects, self.batch_size):
+            if date_field:
+                dates = [getattr(obj, date_field) for obj in chunk]
+            with transaction.atomic():
+                model.objects.bulk_create(chunk, **kwargs)
+                if date_field:
+                    for obj, date in zip(chunk, dates):
+                        setattr(obj, date_field, date)
+                    model.objects.bulk_update(chunk, [date_field])
+            created += len(chunk)
+        return created
+
+    def text(self):
+        words = self.rng.choices(WORDS, k=self.rng.randint(3, 40))
+        if self.rng.random() < 0.2:
+            words.append('#' + self.rng.choice(TAG_NAMES))
+        if self.rng.random() < 0.05:
+            words.append('@' + self.username(self.rng.choice(self.users)))
+        return ' '.join(words)
+
+    def username(self, pk):
+        return f'user{pk}'
+
+    def slug(self, pk):
+        return f'group-{pk}'
+
+    def create_users(self, users):
+        password = (
+            make_password(self.options['password'])
+            if self.options['password'] else make_password(None)
+        )
+        self.insert(User, (
+            User(pk=pk, username=self.username(pk), password=password)
+            for pk in users
+        ))
+        return users
+
+    def create_groups(self, groups):
+        self.insert(Group, (
+            Group(
+                pk=pk,
+                title=f'Группа {pk}',
+                slug=self.slug(pk),
+                description=' '.join(self.rng.choices(WORDS, k=12)),
+            )
+            for pk in groups
+        ))
+        return groups
+
+    def random_group(self):
+        if self.groups and self.rng.random() < 0.7:
+            return self.rng.choice(self.groups)
+        return None
+
+    def create_images(self):
+        names = []
+        for _ in range(self.options['image_pool']):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            buffer = BytesIO()
+            Image.new('RGB', (1280, 720), color).save(buffer, 'JPEG')
+            names.append(post_image_storage.save(
+                'posts/seed.jpg', ContentFile(buffer.getvalue())
+            ))
+        return names
+
+    def create_posts(self):
+        count = self.options['posts']
+        posts = self.new_pks(Post, count)
+        step = timedelta(days=self.options['days']) / max(count, 1)
+        dates = [START + step * index for index in range(count)]
+        authors = popularity(len(self.users), self.options['alpha'], self.rng)
+        images = self.create_images() if self.options['images'] else []
+
+        def build():
+            for batch in chunks(zip(posts, dates), self.batch_size):
+                author_ids = self.rng.choices(
+                    self.users, cum_weights=authors, k=len(batch)
+                )
+                for (pk, pub_date), author in zip(batch, author_ids):
+                    yield Post(
+                        pk=pk,
+                        text=self.text(),
+                        author_id=author,
+                        group_id=self.random_group(),
+                        image=(
+                            self.rng.choice(images)
+                            if self.rng.random() < self.options['images']
+                            else ''
+                        ),
+                        pub_date=pub_date,
+                    )
+        self.insert(Post, build(), date_field='pub_date')
+        return posts, dates
+
+    def create_comments(self):
+        if not self.posts:
+            return 0
+        posts = popularity(len(self.posts), self.options['alpha'], self.rng)
+        authors = popularity(len(self.users), self.options['alpha'], self.rng)
+        total = self.options['comments']
+        comments = iter(self.new_pks(Comment, total))
+
+        def build():
+            for first in range(0, total, self.batch_size):
+                size = min(self.batch_size, total - first)
+                indexes = self.rng.choices(
+                    range(len(self.posts)), cum_weights=posts, k=size
+                )
+                author_ids = self.rng.choices(
+                    self.users, cum_weights=authors, k=size
+                )
+                for index, author in zip(indexes, author_ids):
+                    yield Comment(
+                        pk=next(comments),
+                        post_id=self.posts[index],
+                        author_id=author,
+                        text=self.text(),
+                        created=self.post_dates[index] + timedelta(
+                            seconds=self.rng.expovariate(1 / 3600)
+                        ),
+                    )
+        return self.insert(Comment, build(), date_field='created')
+
+    def follow_count(self):
+        alpha = self.options['alpha']
+        scale = self.options['follows_per_user'] * (alpha - 1) / alpha
+        return min(
+            int(scale * self.rng.paretovariate(alpha)), len(self.users) - 1
+        )
+
+    def create_follows(self):
+        authors = popularity(len(self.users), self.options['alpha'], self.rng)
+
+        def build():
+            for user in self.users:
+                targets = set(self.rng.choices(
+                    self.users, cum_weights=authors, k=self.follow_count()
+                ))
+                targets.discard(user)
+                for author in sorted(targets):
+                    yield Follow(user_id=user, author_id=author)
+        return self.insert(Follow, build(), ignore_conflicts=True)
+
+    def rebuild_derived_data(self):
+        """Пересобирает то, что обычно поддерживают сигналы.
+
+        bulk_create сигналы не отправляет, поэтому счётчики, ленты
+        подписок, теги, поисковый индекс и кэш лент собираются здесь.
+        """
+        counters.repair_user_stats(self.batch_size)
+        counters.repair_comments_counts(self.batch_size)
+        followers = defaultdict(list)
+        for user, author in Follow.objects.filter(
+            author_id__gte=self.users[0], author_id__lte=self.users[-1]
+        ).values_list('user_id', 'author_id').iterator():
+            followers[author].append(user)
+        for author, user_ids in followers.items():
+            if not timeline.is_pull_author(author):
+                with transaction.atomic():
+                    timeline.backfill(user_ids, author)
+        for posts in chunks(self.posts, TAGS_BATCH_SIZE):
+            with transaction.atomic():
+                tags.sync_posts(
+                    Post.objects.filter(
+                        pk__range=(posts[0], posts[-1])
+                    ).only('text', 'pub_date')
+                )
+        search.rebuild_index()
+        self.reset_feed_caches()
+
+    def reset_feed_caches(self):
+        tag_ids = Tag.objects.filter(
+            name__in=TAG_NAMES
+        ).values_list('pk', flat=True)
+        count_keys = [feed_counts.feed_key(feed_counts.GLOBAL)]
+        count_keys += [
+            feed_counts.feed_key(feed_counts.GROUP, pk) for pk in self.groups
+        ]
+        count_keys += [
+            feed_counts.feed_key(kind, pk)
+            for kind in (
+                feed_counts.AUTHOR, feed_counts.FOLLOW, feed_counts.MENTION
+            )
+            for pk in self.users
+        ]
+        count_keys += [
+            feed_counts.feed_key(feed_counts.TAG, pk) for pk in tag_ids
+        ]
+        for keys in chunks(count_keys, self.batch_size):
+            feed_counts.reset_counts(keys)
+        version_keys = [feed_cache.version_key(feed_cache.INDEX)]
+        version_keys += [
+            feed_cache.version_key(feed_cache.GROUP, pk) for pk in self.groups
+        ]
+        version_keys += [
+            feed_cache.version_key(kind, pk)
+            for kind in (feed_cache.AUTHOR, feed_cache.FOLLOW)
+            for pk in self.users
+        ]
+        for keys in chunks(version_keys, self.batch_size):
+            feed_cache.bump_versions(keys)
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+CREATE_INDEX = (
+    'CREATE VIRTUAL TABLE posts_post_fts USING fts5('
+    "text, group_title, tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+FILL_INDEX = (
+    'INSERT INTO posts_post_fts (rowid, text, group_title) '
+    "SELECT post.id, post.text, COALESCE(grp.title, '') "
+    'FROM posts_post AS post '
+    'LEFT JOIN posts_group AS grp ON grp.id = post.group_id'
+)
+
+DROP_INDEX = 'DROP TABLE IF EXISTS posts_post_fts'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(CREATE_INDEX)
+        schema_editor.execute(FILL_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_content_hashed_images'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,128 @@
+import base64
+import binascii
+
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def encode_cursor(value, pk):
+    raw = f'{value.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        value, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        value = parse_datetime(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as error:
+        raise InvalidCursor('Некорректный курсор страницы') from error
+    if value is None:
+        raise InvalidCursor('Некорректный курсор страницы')
+    return value, pk
+
+
+class CountedPaginator(Paginator):
+    """Нумерованные страницы с заранее известным числом записей.
+
+    Вместо полного списка страниц отдаёт сокращённое окно вокруг текущей.
+    """
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, count, on_each_side=2,
+                 on_ends=1):
+        super().__init__(object_list, per_page)
+        self.count = count
+        self.on_each_side = on_each_side
+        self.on_ends = on_ends
+
+    def get_elided_page_range(self, number):
+        window = self.on_each_side + self.on_ends
+        if self.num_pages <= (window + 1) * 2:
+            yield from self.page_range
+            return
+        if number > window + 1:
+            yield from range(1, self.on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - self.on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - window:
+            yield from range(number + 1, number + self.on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(
+                self.num_pages - self.on_ends + 1, self.num_pages + 1
+            )
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+    def _get_page(self, *args, **kwargs):
+        page = super()._get_page(*args, **kwargs)
+        page.elided_page_range = list(
+            self.get_elided_page_range(page.number)
+        )
+        return page
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (дата, уникальное поле) без COUNT и OFFSET.
+
+    Страница выбирается относительно курсора соседней страницы, поэтому
+    стоимость запроса не зависит от того, насколько далеко листает
+    пользователь. Оба поля ordering сортируются в одном направлении.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk')):
+        self.descending = ordering[0].startswith('-')
+        self.field, self.tie_field = (field.lstrip('-') for field in ordering)
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    def _seek(self, cursor, forward):
+        value, pk = decode_cursor(cursor)
+        lookup = 'lt' if forward == self.descending else 'gt'
+        return self.object_list.filter(
+            Q(**{f'{self.field}__{lookup}': value})
+            | Q(**{self.field: value, f'{self.tie_field}__{lookup}': pk})
+        )
+
+    def _cursor(self, obj):
+        return encode_cursor(
+            getattr(obj, self.field), getattr(obj, self.tie_field)
+        )
+
+    def get_cursor_page(self, after=None, before=None):
+        try:
+            if before:
+                rows = list(
+                    self._seek(before, forward=False)
+                    .reverse()[:self.per_page + 1]
+                )
+                has_previous = len(rows) > self.per_page
+                rows = rows[:self.per_page][::-1]
+                has_next = True
+            else:
+                queryset = (
+                    self._seek(after, forward=True)
+                    if after else self.object_list
+                )
+                rows = list(queryset[:self.per_page + 1])
+                has_next = len(rows) > self.per_page
+                rows = rows[:self.per_page]
+                has_previous = bool(after)
+        except InvalidCursor:
+            return self.get_cursor_page()
+        if not rows and (after or before):
+            return self.get_cursor_page()
+        if has_next:
+            self.next_cursor = self._cursor(rows[-1])
+        if has_previous:
+            self.previous_cursor = self._cursor(rows[0])
+        return Page(rows, None, self)
@@ -0,0 +1,108 @@
+"""Полнотекстовый поиск по текстам постов и названиям групп.
+
+На SQLite посты индексируются в виртуальной таблице FTS5 POST_INDEX,
+которую сигналы обновляют при сохранении и удалении постов и групп.
+Результаты упорядочены по релевантности (bm25). На других базах поиск
+сводится к фильтру icontains по тем же полям.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Post
+
+POST_INDEX = 'posts_post_fts'
+
+WORD_RE = re.compile(r'\w+')
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Запрос FTS5 из слов запроса пользователя.
+
+    Каждое слово ищется как префикс, операторы FTS5 из ввода
+    не поддерживаются, поэтому любой ввод даёт корректный запрос.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD_RE.findall(query.lower()))
+
+
+def index_post(post):
+    if not is_supported():
+        return
+    group_title = post.group.title if post.group_id else ''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {POST_INDEX} WHERE rowid = %s', [post.pk]
+        )
+        cursor.execute(
+            f'INSERT INTO {POST_INDEX} (rowid, text, group_title) '
+            f'VALUES (%s, %s, %s)',
+            [post.pk, post.text, group_title],
+        )
+
+
+def unindex_post(post_id):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {POST_INDEX} WHERE rowid = %s', [post_id]
+        )
+
+
+def index_group_title(group_id, title):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {POST_INDEX} SET group_title = %s WHERE rowid IN '
+            f'(SELECT id FROM posts_post WHERE group_id = %s)',
+            [title, group_id],
+        )
+
+
+def search_posts(query, queryset=None):
+    """Посты, подходящие под запрос, от более релевантных к менее."""
+    if queryset is None:
+        queryset = Post.objects.all()
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    if not is_supported():
+        words = WORD_RE.findall(query)
+        condition = Q()
+        for word in words:
+            condition &= (
+                Q(text__icontains=word) | Q(group__title__icontains=word)
+            )
+        return queryset.filter(condition).order_by('-pub_date', '-pk')
+    return queryset.extra(
+        tables=[POST_INDEX],
+        where=[
+            f'{POST_INDEX}.rowid = posts_post.id',
+            f'{POST_INDEX} MATCH %s',
+        ],
+        params=[expression],
+        select={'rank': f'{POST_INDEX}.rank'},
+    ).order_by('rank', '-pk')
+
+
+def rebuild_index():
+    """Заполняет индекс заново по всем постам.
+
+    Нужна после загрузки постов в обход сигналов, например bulk_create.
+    """
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {POST_INDEX}')
+        cursor.execute(
+            f'INSERT INTO {POST_INDEX} (rowid, text, group_title) '
+            f"SELECT post.id, post.text, COALESCE(grp.title, '') "
+            f'FROM posts_post AS post '
+            f'LEFT JOIN posts_group AS grp ON grp.id = post.group_id'
+        )
@@ -0,0 +1,282 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import (counters, feed_cache, feed_counts, search, tags, thumbnails,
+               timeline)
+from .models import (Comment, Follow, Group, Post, PostImageVariant, User,
+                     UserStats)
+
+
+def follower_ids(author_id):
+    return Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_author_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user_stats(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_author_post(sender, instance, **kwargs):
+    counters.change_user_stats(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_comments_count(instance.post_id, 1)
+        counters.change_user_stats(instance.author_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.change_comments_count(instance.post_id, -1)
+    counters.change_user_stats(instance.author_id, comments_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user_stats(instance.author_id, followers_count=1)
+        counters.change_user_stats(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.change_user_stats(instance.author_id, followers_count=-1)
+    counters.change_user_stats(instance.user_id, following_count=-1)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, **kwargs):
+    instance._previous_group_id = None
+    instance._previous_image = None
+    instance._previous_text = None
+    if instance.pk:
+        (
+            instance._previous_group_id,
+            instance._previous_image,
+            instance._previous_text,
+        ) = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image', 'text')
+            .first()
+        ) or (None, None, None)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    if created:
+        feed_counts.change_counts(
+            feed_counts.post_feed_keys(
+                instance, follower_ids(instance.author_id)
+            ),
+            1,
+        )
+        return
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id != instance.group_id:
+        feed_counts.reset_counts(
+            feed_counts.feed_key(feed_counts.GROUP, group_id)
+            for group_id in (previous_group_id, instance.group_id)
+            if group_id
+        )
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    feed_counts.change_counts(
+        feed_counts.post_feed_keys(
+            instance, follower_ids(instance.author_id)
+        ),
+        -1,
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def reset_follow_count(sender, instance, **kwargs):
+    feed_counts.reset_counts(
+        [feed_counts.feed_key(feed_counts.FOLLOW, instance.user_id)]
+    )
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def schedule_thumbnails(sender, instance, raw=False, **kwargs):
+    previous_image = getattr(instance, '_previous_image', None)
+    if instance.image and instance.image.name != previous_image and not raw:
+        thumbnails.schedule(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, **kwargs):
+    previous_image = getattr(instance, '_previous_image', None)
+    if previous_image and previous_image != instance.image.name:
+        transaction.on_commit(lambda: thumbnails.release(previous_image))
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    name = instance.image.name
+    if name:
+        transaction.on_commit(lambda: thumbnails.release(name))
+
+
+@receiver(post_delete, sender=PostImageVariant)
+def delete_variant_file(sender, instance, **kwargs):
+    name = instance.image.name
+    if not PostImageVariant.objects.filter(image=name).exists():
+        instance.image.storage.delete(name)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if (
+        created
+        and not raw
+        and not timeline.is_pull_author(instance.author_id)
+    ):
+        timeline.backfill([instance.user_id], instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+    if (
+        timeline.followers_count(instance.author_id)
+        == settings.TIMELINE_FANOUT_LIMIT
+    ):
+        timeline.backfill(
+            follower_ids(instance.author_id), instance.author_id
+        )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    feed_cache.bump_versions(
+        feed_cache.post_version_keys(
+            instance, [getattr(instance, '_previous_group_id', None)]
+        )
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feeds(sender, instance, **kwargs):
+    post = Post.objects.filter(pk=instance.post_id).first()
+    if post is not None:
+        feed_cache.bump_versions(feed_cache.post_version_keys(post))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, **kwargs):
+    author_ids = (
+        Post.objects.filter(group=instance)
+        .values_list('author_id', flat=True)
+        .distinct()
+    )
+    feed_cache.bump_versions([
+        feed_cache.version_key(feed_cache.INDEX),
+        feed_cache.version_key(feed_cache.GROUP, instance.pk),
+        *(
+            feed_cache.version_key(feed_cache.AUTHOR, author_id)
+            for author_id in author_ids
+        ),
+    ])
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def index_group_title(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.index_group_title(instance.pk, instance.title)
+
+
+@receiver(pre_delete, sender=Group)
+def unindex_group_title(sender, instance, **kwargs):
+    search.index_group_title(instance.pk, '')
+
+
+@receiver(post_save, sender=Post)
+def sync_post_tags(sender, instance, created, raw=False, **kwargs):
+    if raw or instance.text == getattr(instance, '_previous_text', None):
+        return
+    if created and not tags.has_markup(instance.text):
+        return
+    tags.sync_posts([instance])
+
+
+@receiver(pre_delete, sender=Post)
+def reset_tag_counts(sender, instance, **kwargs):
+    feed_counts.reset_counts(tags.count_keys([instance.pk]))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feeds(sender, instance, **kwargs):
+    feed_cache.bump_versions([
+        feed_cache.version_key(feed_cache.FOLLOW),
+        feed_cache.version_key(feed_cache.FOLLOW, instance.user_id),
+        feed_cache.version_key(feed_cache.FOLLOW, instance.author_id),
+    ])
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_feeds(sender, instance, created, update_fields=None,
+                          raw=False, **kwargs):
+    if created or raw or update_fields == frozenset(['last_login']):
+        return
+    # Имя пользователя показано в карточках его постов во всех лентах
+    # и в комментариях на страницах чужих постов.
+    group_ids = (
+        Post.objects.filter(author=instance, group__isnull=False)
+        .values_list('group_id', flat=True)
+        .distinct()
+    )
+    commented_post_ids = (
+        Comment.objects.filter(author=instance)
+        .values_list('post_id', flat=True)
+        .distinct()
+    )
+    feed_cache.bump_versions([
+        feed_cache.version_key(feed_cache.INDEX),
+        feed_cache.version_key(feed_cache.AUTHOR, instance.pk),
+        *(
+            feed_cache.version_key(feed_cache.GROUP, group_id)
+            for group_id in group_ids
+        ),
+        *(
+            feed_cache.version_key(feed_cache.POST, post_id)
+            for post_id in commented_post_ids
+        ),
+    ])
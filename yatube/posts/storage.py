@@ -0,0 +1,67 @@
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import locks
+from django.core.files.storage import FileSystemStorage
+
+LOCK_NAME = '.content-hash.lock'
+
+
+def hashed_name(name, content):
+    """Имя файла по SHA-256 содержимого в каталоге исходного имени."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    directory, filename = os.path.split(name)
+    extension = os.path.splitext(filename)[1].lower()
+    return os.path.join(directory, digest.hexdigest() + extension)
+
+
+class ContentHashStorage(FileSystemStorage):
+    """Хранит каждое различное содержимое в одном файле.
+
+    Одинаковые загрузки получают одно имя, поэтому файл и его миниатюры
+    используются всеми постами с этой картинкой. Файл удаляется, когда
+    на него не остаётся ссылок (см. posts.signals).
+
+    Пост с повторной загрузкой сохраняется уже после _save, поэтому
+    _save под блокировкой обновляет время изменения файла, а удаление
+    под той же блокировкой пропускает файлы, изменённые меньше
+    POST_IMAGE_REUSE_GRACE секунд назад; их удаляет позже команда
+    cleanup_images.
+    """
+
+    def _save(self, name, content):
+        name = hashed_name(name, content)
+        with self.lock():
+            if self.exists(name):
+                os.utime(self.path(name))
+                return name
+            return super()._save(name, content)
+
+    @contextmanager
+    def lock(self):
+        """Блокировка между процессами на повторное использование файлов."""
+        os.makedirs(self.location, exist_ok=True)
+        with open(self.path(LOCK_NAME), 'a') as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(lock_file)
+
+    def recently_saved(self, name):
+        try:
+            modified = os.path.getmtime(self.path(name))
+        except (OSError, SuspiciousFileOperation):
+            return False
+        return time.time() - modified < settings.POST_IMAGE_REUSE_GRACE
+
+
+post_image_storage = ContentHashStorage()
@@ -0,0 +1,103 @@
+"""Теги #тег и упоминания @пользователь в текстах постов.
+
+При сохранении поста теги и упоминания разбираются из текста и
+записываются в PostTag и Mention вместе с датой публикации, поэтому
+ленты тега и упоминаний читаются по индексу, как лента подписок.
+"""
+import re
+
+from django.db.models import F
+
+from . import feed_counts
+from .models import Mention, Post, PostTag, Tag, User
+from .timeline import FEED_ORDERING
+
+# Теги длиннее Tag.name не распознаются, а не обрезаются.
+TAG_RE = re.compile(r'(?<![\w#&])#(\w{1,50})(?!\w)')
+MENTION_RE = re.compile(r'(?<![\w@])@([\w.+-]*\w)')
+
+
+def has_markup(text):
+    return bool(TAG_RE.search(text) or MENTION_RE.search(text))
+
+
+def parse_tags(text):
+    return {name.lower() for name in TAG_RE.findall(text)}
+
+
+def parse_mentions(text):
+    return set(MENTION_RE.findall(text))
+
+
+def ensure_tags(names):
+    """Словарь {название: id}, недостающие теги создаются."""
+    tags = dict(Tag.objects.filter(name__in=names).values_list('name', 'pk'))
+    missing = set(names) - set(tags)
+    if missing:
+        Tag.objects.bulk_create(
+            (Tag(name=name) for name in missing), ignore_conflicts=True
+        )
+        tags = dict(
+            Tag.objects.filter(name__in=names).values_list('name', 'pk')
+        )
+    return tags
+
+
+def count_keys(post_ids):
+    tag_ids = PostTag.objects.filter(
+        post_id__in=post_ids
+    ).values_list('tag_id', flat=True)
+    user_ids = Mention.objects.filter(
+        post_id__in=post_ids
+    ).values_list('user_id', flat=True)
+    return [
+        *(feed_counts.feed_key(feed_counts.TAG, pk) for pk in tag_ids),
+        *(feed_counts.feed_key(feed_counts.MENTION, pk) for pk in user_ids),
+    ]
+
+
+def sync_posts(posts):
+    """Пересобирает теги и упоминания постов одним набором запросов."""
+    posts = list(posts)
+    post_ids = [post.pk for post in posts]
+    parsed = {
+        post.pk: (parse_tags(post.text), parse_mentions(post.text))
+        for post in posts
+    }
+    tags = ensure_tags(set().union(*(names for names, _ in parsed.values())))
+    users = dict(
+        User.objects.filter(
+            username__in=set().union(
+                *(usernames for _, usernames in parsed.values())
+            )
+        ).values_list('username', 'pk')
+    )
+    stale_keys = count_keys(post_ids)
+    PostTag.objects.filter(post_id__in=post_ids).delete()
+    Mention.objects.filter(post_id__in=post_ids).delete()
+    PostTag.objects.bulk_create(
+        PostTag(tag_id=tags[name], post=post, pub_date=post.pub_date)
+        for post in posts
+        for name in parsed[post.pk][0]
+    )
+    Mention.objects.bulk_create(
+        Mention(user_id=users[username], post=post, pub_date=post.pub_date)
+        for post in posts
+        for username in parsed[post.pk][1]
+        if username in users
+    )
+    feed_counts.reset_counts(stale_keys + count_keys(post_ids))
+
+
+def tag_feed(tag):
+    return Post.objects.filter(tag_entries__tag=tag).annotate(
+        feed_date=F('tag_entries__pub_date'),
+        feed_post=F('tag_entries__post'),
+    ).order_by(*FEED_ORDERING)
+
+
+def mentions_feed(user):
+    return Post.objects.filter(mention_entries__user=user).annotate(
+        feed_date=F('mention_entries__pub_date'),
+        feed_post=F('mention_entries__post'),
+    ).order_by(*FEED_ORDERING)
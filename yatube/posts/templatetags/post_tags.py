@@ -0,0 +1,78 @@
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+
+from .. import thumbnails, variants
+from ..tags import MENTION_RE, TAG_RE
+
+register = template.Library()
+
+
+def card_key(post):
+    """Ключ карточки меняется вместе с любыми показанными в ней данными."""
+    state = '|'.join(str(value) for value in (
+        post.pk,
+        post.pub_date.isoformat(),
+        post.text,
+        post.image.name,
+        post.comments_count,
+        post.author.username,
+        post.author.get_full_name(),
+        post.group.slug if post.group_id else '',
+    ))
+    return 'post_card:' + hashlib.md5(state.encode()).hexdigest()
+
+
+@register.simple_tag
+def post_cards(posts):
+    keys = [(card_key(post), post) for post in posts]
+    cards = cache.get_many([key for key, _ in keys])
+    thumbnails.prefetch([post for key, post in keys if key not in cards])
+    rendered = {
+        key: render_to_string('posts/post_card.html', {'post': post})
+        for key, post in keys
+        if key not in cards
+    }
+    cards.update(rendered)
+    ready = {
+        key: rendered[key] for key, post in keys
+        if key in rendered and not thumbnails.is_pending(post)
+    }
+    if ready:
+        cache.set_many(ready, settings.POST_CARD_TIMEOUT)
+    return [mark_safe(cards[key]) for key, _ in keys]
+
+
+@register.simple_tag
+def post_thumbnail(post, size):
+    return thumbnails.get_thumbnail(post, size)
+
+
+@register.simple_tag
+def post_srcsets(post):
+    return variants.srcsets(post.image_variants.all())
+
+
+def _tag_link(match):
+    url = reverse('posts:tag_posts', args=[match[1].lower()])
+    return f'<a href="{url}">#{match[1]}</a>'
+
+
+def _mention_link(match):
+    url = reverse('posts:mentions', args=[match[1]])
+    return f'<a href="{url}">@{match[1]}</a>'
+
+
+@register.filter(needs_autoescape=True)
+def linkify(text, autoescape=True):
+    """Превращает #теги и @упоминания в ссылки на их ленты."""
+    if autoescape:
+        text = conditional_escape(text)
+    text = TAG_RE.sub(_tag_link, text)
+    return mark_safe(MENTION_RE.sub(_mention_link, text))
@@ -0,0 +1,69 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.user = User.objects.create_user(username='user')
+        cls.post = Post.objects.create(text='test-text', author=cls.author)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_comment_counters(self):
+        """Комментарий меняет счётчики поста и автора комментария"""
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='comment'
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.stats(self.user).comments_count, 1)
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(self.stats(self.user).comments_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка меняет счётчики подписчиков и подписок"""
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+
+    def test_user_delete_keeps_counters_consistent(self):
+        """Каскадное удаление автора не оставляет лишних строк счётчиков"""
+        author = User.objects.create_user(username='deleted')
+        Post.objects.create(text='test-text', author=author)
+        Follow.objects.create(user=self.user, author=author)
+        author_id = author.pk
+        author.delete()
+        self.assertFalse(UserStats.objects.filter(user_id=author_id).exists())
+        self.assertEqual(self.stats(self.user).following_count, 0)
+
+    def test_recount_counters_repairs_drift(self):
+        """Команда recount_counters исправляет расхождения"""
+        Comment.objects.create(
+            post=self.post, author=self.user, text='comment'
+        )
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        UserStats.objects.filter(user=self.user).delete()
+        Post.objects.filter(pk=self.post.pk).update(comments_count=5)
+        out = StringIO()
+        call_command('recount_counters', stdout=out)
+        self.assertIn('пользователей: 2, постов: 1', out.getvalue())
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.user).comments_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
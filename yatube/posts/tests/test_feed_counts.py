@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.testing import ImmediateOnCommitMixin
+
+from .. import feed_counts
+from ..models import Follow, Group, Post
+from ..paginators import CountedPaginator
+
+User = get_user_model()
+
+
+class FeedCountsTest(ImmediateOnCommitMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.group = Group.objects.create(
+            title='test-title',
+            slug='test-slug',
+            description='test-description',
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.keys = {
+            feed_counts.feed_key(feed_counts.GLOBAL): Post.objects.all(),
+            feed_counts.feed_key(feed_counts.GROUP, self.group.pk):
+                self.group.posts.all(),
+            feed_counts.feed_key(feed_counts.AUTHOR, self.author.pk):
+                self.author.posts.all(),
+            feed_counts.feed_key(feed_counts.FOLLOW, self.follower.pk):
+                Post.objects.filter(author__following__user=self.follower),
+        }
+        for key, queryset in self.keys.items():
+            feed_counts.get_count(key, queryset)
+
+    def assertCounts(self, expected):
+        for key in self.keys:
+            with self.subTest(key=key):
+                self.assertEqual(cache.get(key), expected)
+
+    def test_counts_follow_post_create_and_delete(self):
+        """Счётчики лент меняются при создании и удалении поста"""
+        post = Post.objects.create(
+            text='test-text', author=self.author, group=self.group
+        )
+        self.assertCounts(1)
+        post.delete()
+        self.assertCounts(0)
+
+    def test_group_change_resets_count(self):
+        """Смена группы поста сбрасывает счётчик группы"""
+        post = Post.objects.create(text='test-text', author=self.author)
+        post.group = self.group
+        post.save()
+        key = feed_counts.feed_key(feed_counts.GROUP, self.group.pk)
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(feed_counts.get_count(key, self.group.posts), 1)
+
+    def test_numbered_page_without_count_query(self):
+        """Нумерованная страница не выполняет COUNT при заполненном кэше"""
+        Post.objects.create(text='test-text', author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().get(reverse('posts:index'), {'page': 1})
+        self.assertEqual(len(response.context['page_obj']), 1)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+
+
+class ElidedPageRangeTest(TestCase):
+    def test_elided_page_range(self):
+        paginator = CountedPaginator(Post.objects.all(), 10, 1000)
+        ellipsis = CountedPaginator.ELLIPSIS
+        cases = {
+            1: [1, 2, 3, ellipsis, 100],
+            50: [1, ellipsis, 48, 49, 50, 51, 52, ellipsis, 100],
+            100: [1, ellipsis, 98, 99, 100],
+        }
+        for number, expected in cases.items():
+            with self.subTest(number=number):
+                self.assertEqual(
+                    list(paginator.get_elided_page_range(number)), expected
+                )
+
+    def test_short_page_range(self):
+        paginator = CountedPaginator(Post.objects.all(), 10, 50)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(3)), [1, 2, 3, 4, 5]
+        )
@@ -1,6 +1,7 @@
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -8,11 +9,19 @@ from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from .. import feed_cache
 from ..models import Comment, Group, Post
+from ..storage import hashed_name
+from ..uploads import normalize_image
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+XPM_IMAGE = (
+    b'/* XPM */\nstatic char *icon[] = {\n"2 2 2 1",\n'
+    b'"a c #FF0000",\n"b c #0000FF",\n"ab",\n"ba"\n};\n'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -44,6 +53,10 @@ class PostFormTest(TestCase):
             content=small_gif,
             content_type='image/gif'
         )
+        cls.image_name = hashed_name(
+            'posts/small.gif',
+            normalize_image(SimpleUploadedFile('small.gif', small_gif)),
+        )
         cls.new_post = {
             'text': 'test-text add',
             'group': cls.group.id,
@@ -85,7 +98,7 @@ class PostFormTest(TestCase):
             Post.objects.filter(
                 text='test-text add',
                 group=self.group.id,
-                image='posts/small.gif'
+                image=self.image_name
             ).exists()
         )
 
@@ -125,6 +138,118 @@ class PostFormTest(TestCase):
         )
 
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageUploadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    @staticmethod
+    def get_image(size, image_format='JPEG', name='photo.jpg', **params):
+        buffer = BytesIO()
+        Image.new('RGB', size, (255, 0, 0)).save(
+            buffer, image_format, **params
+        )
+        return SimpleUploadedFile(
+            name, buffer.getvalue(), content_type='image/jpeg'
+        )
+
+    def create_post(self, image):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'test-text', 'image': image},
+        )
+
+    @override_settings(POST_IMAGE_MAX_BYTES=100)
+    def test_too_large_file(self):
+        """Файл больше лимита отбрасывается при загрузке"""
+        response = self.create_post(self.get_image((200, 200)))
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 100\xa0байт'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=10 ** 6)
+    def test_too_many_pixels(self):
+        """Размеры изображения проверяются по заголовку"""
+        response = self.create_post(self.get_image((2000, 1000)))
+        self.assertFormError(
+            response, 'form', 'image', 'Изображение больше 1 мегапикселей'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(
+        POST_IMAGE_MAX_PIXELS=10 ** 7, POST_IMAGE_MAX_DECODED_PIXELS=10 ** 6
+    )
+    def test_large_png_rejected(self):
+        """PNG декодируется целиком и проверяется по своему пределу"""
+        png = self.get_image((2000, 1000), 'PNG', 'large.png')
+        response = self.create_post(png)
+        self.assertFormError(
+            response, 'form', 'image', 'Изображение больше 1 мегапикселей'
+        )
+        self.assertFalse(Post.objects.exists())
+        self.create_post(self.get_image((2000, 1000)))
+        self.assertTrue(Post.objects.exists())
+
+    def test_animated_image_rejected(self):
+        """Анимированное изображение не принимается"""
+        buffer = BytesIO()
+        frames = [Image.new('P', (2, 2), color) for color in (0, 1)]
+        frames[0].save(
+            buffer, 'GIF', save_all=True, append_images=frames[1:]
+        )
+        response = self.create_post(
+            SimpleUploadedFile('anim.gif', buffer.getvalue(), 'image/gif')
+        )
+        self.assertFormError(
+            response, 'form', 'image',
+            'Анимированные изображения не поддерживаются',
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_csrf_checked_with_upload_limit(self):
+        """Представления с ограничением загрузок проверяют CSRF"""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(
+            reverse('posts:post_create'), {'text': 'test-text'}
+        )
+        self.assertTemplateUsed(response, 'core/403csrf.html')
+        self.assertFalse(Post.objects.exists())
+
+    def test_unwritable_format_saved_as_png(self):
+        """Формат, который Pillow не умеет записывать, сохраняется в PNG"""
+        xpm = SimpleUploadedFile('icon.xpm', XPM_IMAGE, 'image/x-xpixmap')
+        self.create_post(xpm)
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.endswith('.png'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'PNG')
+            self.assertEqual(image.size, (2, 2))
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_image_downsampled_without_metadata(self):
+        """Изображение уменьшается и теряет метаданные"""
+        exif = Image.Exif()
+        exif[0x010F] = 'test-camera'
+        self.create_post(self.get_image((400, 200), exif=exif.tobytes()))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn('exif', image.info)
+
+
 class PostsCommentsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -182,9 +307,59 @@ class CachePostsTest(TestCase):
 
     def test_add_post_in_cache(self):
         response_1 = self.authorized_client.get(reverse('posts:index'))
-        self.post.delete()
+        Post.objects.filter(pk=self.post.pk).update(text='changed-text')
         response_2 = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response_1.content, response_2.content)
         cache.clear()
         response_3 = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(response_2.content, response_3.content)
+
+    def test_post_delete_invalidates_cache(self):
+        """Удаление поста сбрасывает кэш ленты без ожидания"""
+        response_1 = self.authorized_client.get(reverse('posts:index'))
+        self.post.delete()
+        response_2 = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotEqual(response_1.content, response_2.content)
+        self.assertNotContains(response_2, 'test-text')
+
+    def test_cache_depends_on_page(self):
+        """Разные страницы ленты кэшируются отдельно"""
+        Post.objects.bulk_create(
+            Post(text=f'page-text {i}', author=self.user) for i in range(10)
+        )
+        cache.clear()
+        response_1 = self.authorized_client.get(reverse('posts:index'))
+        response_2 = self.authorized_client.get(
+            reverse('posts:index'), {'page': 2}
+        )
+        self.assertNotContains(response_1, 'test-text')
+        self.assertContains(response_2, 'test-text')
+
+    def test_cache_depends_on_feed(self):
+        """Ленты с одинаковой версией не делят фрагмент"""
+        other = User.objects.create_user(username='other')
+        Post.objects.create(text='other-text', author=other)
+        cache.set_many({
+            feed_cache.version_key(feed_cache.AUTHOR, self.user.pk): 1,
+            feed_cache.version_key(feed_cache.AUTHOR, other.pk): 1,
+        }, None)
+        self.authorized_client.get(
+            reverse('posts:profile', args=[self.user.username])
+        )
+        response = self.authorized_client.get(
+            reverse('posts:profile', args=[other.username])
+        )
+        self.assertContains(response, 'other-text')
+        self.assertNotContains(response, 'test-text')
+
+    def test_cache_key_ignores_raw_query(self):
+        """Мусорные параметры страницы не создают новых фрагментов"""
+        self.authorized_client.get(reverse('posts:index'), {'page': 1})
+        self.authorized_client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).update(text='changed-text')
+        for params in ({'page': 'junk'}, {'after': 'junk'}, {'x': 'junk'}):
+            with self.subTest(params=params):
+                response = self.authorized_client.get(
+                    reverse('posts:index'), params
+                )
+                self.assertContains(response, 'test-text')
@@ -0,0 +1,153 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import ImmediateOnCommitMixin
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class HttpCacheTest(ImmediateOnCommitMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='test-title',
+            slug='test-slug',
+            description='test-description',
+        )
+        cls.other_group = Group.objects.create(
+            title='other-title',
+            slug='other-slug',
+            description='other-description',
+        )
+        cls.post = Post.objects.create(
+            text='test-text',
+            author=cls.author,
+            group=cls.group,
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.author.username]),
+            reverse('posts:post_detail', args=[cls.post.pk]),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.authorized = Client()
+        self.authorized.force_login(self.reader)
+
+    def assertNotModified(self, url, etag):
+        response = self.guest.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.templates)
+
+    def assertModified(self, url, etag):
+        response = self.guest.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_anonymous_headers(self):
+        """Гостевые страницы кэшируются публично с валидаторами"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest.get(url)
+                self.assertIn('ETag', response)
+                self.assertIn('Last-Modified', response)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('max-age=60', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+
+    def test_authorized_headers(self):
+        """Страницы пользователя не попадают в общие кэши"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.authorized.get(url)
+                self.assertNotIn('ETag', response)
+                self.assertIn('private', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304 без отрисовки шаблона"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertNotModified(url, self.guest.get(url)['ETag'])
+
+    def test_index_not_modified_without_queries(self):
+        """304 главной страницы не обращается к БД"""
+        url = reverse('posts:index')
+        etag = self.guest.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertNotModified(url, etag)
+
+    def test_if_modified_since(self):
+        """Last-Modified поддерживает If-Modified-Since"""
+        url = reverse('posts:index')
+        last_modified = self.guest.get(url)['Last-Modified']
+        response = self.guest.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_page_in_etag(self):
+        """Разные страницы ленты получают разные ETag"""
+        url = reverse('posts:index')
+        self.assertNotEqual(
+            self.guest.get(url)['ETag'],
+            self.guest.get(url, {'page': 2})['ETag'],
+        )
+
+    def test_group_etag(self):
+        """ETag группы зависит только от постов этой группы"""
+        url = reverse('posts:group_list', args=[self.group.slug])
+        etag = self.guest.get(url)['ETag']
+        Post.objects.create(
+            text='other', author=self.author, group=self.other_group
+        )
+        self.assertNotModified(url, etag)
+        Post.objects.create(text='new', author=self.author, group=self.group)
+        self.assertModified(url, etag)
+
+    def test_post_detail_etag(self):
+        """ETag поста меняется с новым комментарием"""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.guest.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='comment'
+        )
+        self.assertModified(url, etag)
+
+    def test_profile_etag(self):
+        """ETag профиля меняется с новым подписчиком"""
+        url = reverse('posts:profile', args=[self.author.username])
+        etag = self.guest.get(url)['ETag']
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertModified(url, etag)
+
+    def test_author_rename(self):
+        """Новое имя автора видно в группе и в комментариях"""
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='comment'
+        )
+        group_url = reverse('posts:group_list', args=[self.group.slug])
+        post_url = reverse('posts:post_detail', args=[self.post.pk])
+        group_etag = self.guest.get(group_url)['ETag']
+        post_etag = self.guest.get(post_url)['ETag']
+        self.author.first_name = 'Переименованный'
+        self.author.save()
+        self.reader.username = 'commentator'
+        self.reader.save()
+        self.assertModified(group_url, group_etag)
+        self.assertContains(self.guest.get(group_url), 'Переименованный')
+        self.assertModified(post_url, post_etag)
+        self.assertContains(self.guest.get(post_url), 'commentator')
+
+    def test_missing_object(self):
+        """Отсутствующая страница не получает валидаторов"""
+        response = self.guest.get(reverse('posts:group_list', args=['none']))
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
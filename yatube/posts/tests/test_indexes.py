@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedIndexesTest(TestCase):
+    """Запросы лент читают строки в порядке индекса, без сортировки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='test-title',
+            slug='test-slug',
+            description='test-description',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(12):
+            Post.objects.create(
+                text=f'test-text {i}', author=cls.author, group=cls.group
+            )
+        cls.post = Post.objects.first()
+        Comment.objects.create(post=cls.post, author=cls.user, text='text')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def query_plans(self, url, table, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, params)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if f'FROM "{table}"' in sql and 'ORDER BY' in sql:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                    plans.append(' '.join(row[-1] for row in cursor))
+        return plans
+
+    def assertIndexOrdered(self, plans):
+        self.assertTrue(plans)
+        for plan in plans:
+            with self.subTest(plan=plan):
+                self.assertIn('INDEX', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_feeds_use_indexes(self):
+        feeds = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:follow_index'),
+        ]
+        for url in feeds:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                cursor = response.context['page_obj'].paginator.next_cursor
+                for params in (None, {'after': cursor}, {'page': 2}):
+                    self.assertIndexOrdered(
+                        self.query_plans(url, 'posts_post', params)
+                    )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_follow_feed_with_popular_author_uses_indexes(self):
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.user, author=other)
+        Post.objects.create(text='test-text', author=other)
+        url = reverse('posts:follow_index')
+        response = self.client.get(url)
+        cursor = response.context['page_obj'].paginator.next_cursor
+        for params in (None, {'after': cursor}, {'page': 2}):
+            plans = self.query_plans(url, 'posts_post', params)
+            self.assertEqual(len(plans), 3)
+            self.assertIndexOrdered(plans)
+
+    def test_comments_use_index(self):
+        self.assertIndexOrdered(self.query_plans(
+            reverse('posts:post_detail', args=[self.post.pk]),
+            'posts_comment',
+        ))
+
+    def test_tag_feeds_use_indexes(self):
+        for post in Post.objects.all():
+            post.text += ' #тег @auth'
+            post.save()
+        feeds = [
+            reverse('posts:tag_posts', args=['тег']),
+            reverse('posts:mentions', args=[self.user.username]),
+        ]
+        for url in feeds:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                cursor = response.context['page_obj'].paginator.next_cursor
+                for params in (None, {'after': cursor}, {'page': 2}):
+                    self.assertIndexOrdered(
+                        self.query_plans(url, 'posts_post', params)
+                    )
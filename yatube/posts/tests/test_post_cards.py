@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..templatetags.post_tags import card_key
+
+User = get_user_model()
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='test-title',
+            slug='test-slug',
+            description='test-description',
+        )
+        cls.post = Post.objects.create(
+            text='test-text',
+            author=cls.user,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def test_card_shared_between_feeds(self):
+        """Карточка поста рендерится один раз для всех лент"""
+        self.guest.get(reverse('posts:index'))
+        cache.set(card_key(self.post), 'cached-card')
+        for page in (
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+        ):
+            with self.subTest(page=page):
+                self.assertContains(self.guest.get(page), 'cached-card')
+
+    def test_card_key_follows_changes(self):
+        """Изменение поста, автора или группы меняет ключ карточки"""
+        post = Post.objects.select_related().get(pk=self.post.pk)
+        key = card_key(post)
+        post.text = 'new-text'
+        self.assertNotEqual(card_key(post), key)
+        key = card_key(post)
+        post.author.first_name = 'Имя'
+        self.assertNotEqual(card_key(post), key)
+        key = card_key(post)
+        post.group.slug = 'new-slug'
+        self.assertNotEqual(card_key(post), key)
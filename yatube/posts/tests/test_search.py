@@ -0,0 +1,100 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..search import rebuild_index, search_posts
+
+User = get_user_model()
+
+
+class PostSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Котики',
+            slug='test-slug',
+            description='test-description',
+        )
+        cls.rare = Post.objects.create(
+            text='Прогулка по набережной', author=cls.user
+        )
+        cls.frequent = Post.objects.create(
+            text='Набережная, набережная и снова набережная',
+            author=cls.user,
+        )
+        cls.grouped = Post.objects.create(
+            text='Фотография дня', author=cls.user, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def test_ranked_by_relevance(self):
+        """Результаты упорядочены по релевантности, слова ищутся по префиксу"""
+        self.assertEqual(
+            list(search_posts('набережн')), [self.frequent, self.rare]
+        )
+
+    def test_group_title_indexed(self):
+        """Пост находится по названию группы и после её переименования"""
+        self.assertEqual(list(search_posts('котики')), [self.grouped])
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Собаки'
+        group.save()
+        self.assertEqual(list(search_posts('собаки')), [self.grouped])
+        self.assertFalse(search_posts('котики').exists())
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при изменении и удалении поста"""
+        post = Post.objects.create(text='Старый текст', author=self.user)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertFalse(search_posts('старый').exists())
+        self.assertEqual(list(search_posts('новый')), [post])
+        post.delete()
+        self.assertFalse(search_posts('новый').exists())
+
+    def test_rebuild_index(self):
+        """Посты, созданные в обход сигналов, попадают в индекс"""
+        Post.objects.bulk_create([
+            Post(text='Маяк на мысу', author=self.user),
+        ])
+        self.assertFalse(search_posts('маяк').exists())
+        rebuild_index()
+        self.assertEqual(search_posts('маяк').count(), 1)
+        self.assertEqual(search_posts('набережн').count(), 2)
+
+    def test_user_syntax_is_escaped(self):
+        """Операторы FTS5 во вводе пользователя не ломают поиск"""
+        for query in ('"', 'NOT', 'набережн*) OR (', '', '   '):
+            with self.subTest(query=query):
+                list(search_posts(query))
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_search_page(self):
+        """Страница поиска показывает карточки и сохраняет запрос"""
+        response = self.guest.get(
+            reverse('posts:post_search'), {'q': 'набережн'}
+        )
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+        self.assertContains(response, self.frequent.text)
+        self.assertContains(response, '?q=%D0%BD%D0%B0%D0%B1')
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по тому же индексу"""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котики'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.grouped]
+        )
@@ -0,0 +1,130 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from core.testing import ImmediateOnCommitMixin
+
+from .. import counters, feed_counts
+from ..management.commands.seed_yatube import START
+from ..models import (Comment, Follow, Group, Post, PostTag, TimelineEntry,
+                      User)
+from ..search import search_posts
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SEED_OPTIONS = {
+    'users': 30,
+    'groups': 4,
+    'posts': 300,
+    'comments': 400,
+    'follows_per_user': 5,
+    'batch_size': 100,
+}
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedCommandTest(ImmediateOnCommitMixin, TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self, **options):
+        out = StringIO()
+        call_command('seed_yatube', stdout=out, **{**SEED_OPTIONS, **options})
+        return out.getvalue()
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('pk').values_list(
+                'text', 'author__username', 'group__slug', 'pub_date'
+            )),
+            list(Follow.objects.order_by('pk').values_list(
+                'user__username', 'author__username'
+            )),
+            list(Comment.objects.order_by('pk').values_list(
+                'post__text', 'author__username', 'created'
+            )),
+        )
+
+    def test_creates_rows(self):
+        """Команда создаёт заданное число строк"""
+        out = self.seed()
+        self.assertIn('постов: 300', out)
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 400)
+        self.assertTrue(Follow.objects.exists())
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+
+    def test_derived_data_rebuilt(self):
+        """Счётчики, ленты, теги и поиск собраны, как после сигналов"""
+        global_key = feed_counts.feed_key(feed_counts.GLOBAL)
+        cache.set(global_key, 0)
+        self.seed()
+        self.assertEqual(counters.repair_user_stats(), 0)
+        self.assertEqual(counters.repair_comments_counts(), 0)
+        self.assertIsNone(cache.get(global_key))
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=follow.user).count(),
+            Post.objects.filter(
+                author__following__user=follow.user
+            ).count(),
+        )
+        self.assertTrue(PostTag.objects.exists())
+        self.assertTrue(search_posts('кофе').exists())
+
+    def test_deterministic(self):
+        """Один и тот же seed даёт одни и те же данные"""
+        self.seed(seed=7)
+        first = self.snapshot()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.seed(seed=7)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_historical_dates(self):
+        """Даты постов и комментариев берутся из прошлого"""
+        self.seed()
+        self.assertEqual(
+            Post.objects.order_by('pk').values_list(
+                'pub_date', flat=True
+            ).first(),
+            START,
+        )
+        self.assertFalse(Comment.objects.filter(
+            created__year__gt=START.year + 1
+        ).exists())
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+        self.assertTrue(Comment._meta.get_field('created').auto_now_add)
+
+    def test_images(self):
+        """Картинки берутся из пула различных файлов"""
+        self.seed(images=0.5, image_pool=3)
+        images = set(
+            Post.objects.exclude(image='').values_list('image', flat=True)
+        )
+        self.assertEqual(len(images), 3)
+        self.assertTrue(Post.objects.filter(image='').exists())
+
+    def test_invalid_options(self):
+        """Некорректные параметры отклоняются"""
+        for options in ({'alpha': 1}, {'images': 2}, {'users': 1}):
+            with self.subTest(options=options):
+                with self.assertRaises(CommandError):
+                    self.seed(**options)
+
+    def test_name_collision(self):
+        """Занятое имя останавливает команду до записи данных"""
+        User.objects.create_user(username='user5')
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.assertEqual(User.objects.count(), 1)
+        self.assertFalse(Group.objects.exists())
@@ -0,0 +1,162 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError
+from django.db.models.signals import post_save
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default
+
+from .. import thumbnails
+from ..models import Post
+from ..storage import post_image_storage
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0, POST_IMAGE_REUSE_GRACE=0
+)
+class ContentHashStorageTest(TransactionTestCase):
+    def setUp(self):
+        default.kvstore.memory.clear()
+        self.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name='small.gif'):
+        return Post.objects.create(
+            text='test-text',
+            author=self.user,
+            image=SimpleUploadedFile(name, SMALL_GIF),
+        )
+
+    def test_same_content_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом с общими миниатюрами"""
+        first = self.create_post()
+        with mock.patch.object(
+            thumbnails.backend, '_create_thumbnail'
+        ) as create_thumbnail:
+            second = self.create_post('other.gif')
+        create_thumbnail.assert_not_called()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith('posts/'))
+        self.assertEqual(
+            sorted(second.image_variants.values_list('image', flat=True)),
+            sorted(first.image_variants.values_list('image', flat=True)),
+        )
+
+    def test_file_removed_with_last_reference(self):
+        """Файл удаляется вместе с последним ссылающимся постом"""
+        first = self.create_post()
+        second = self.create_post()
+        name = first.image.name
+        variant_names = list(
+            first.image_variants.values_list('image', flat=True)
+        )
+        first.delete()
+        self.assertTrue(post_image_storage.exists(name))
+        for variant_name in variant_names:
+            with self.subTest(variant=variant_name):
+                self.assertTrue(post_image_storage.exists(variant_name))
+        second.delete()
+        self.assertFalse(post_image_storage.exists(name))
+        self.assertIsNone(thumbnails.get_thumbnails([name])[name]['card'])
+        for variant_name in variant_names:
+            with self.subTest(variant=variant_name):
+                self.assertFalse(post_image_storage.exists(variant_name))
+
+    @override_settings(POST_IMAGE_REUSE_GRACE=60)
+    def test_recently_saved_file_kept(self):
+        """Только что сохранённый файл не удаляется сразу"""
+        first = self.create_post()
+        name = first.image.name
+        first.delete()
+        self.assertTrue(post_image_storage.exists(name))
+        second = self.create_post()
+        self.assertEqual(second.image.name, name)
+        with override_settings(POST_IMAGE_REUSE_GRACE=0):
+            thumbnails.release(name)
+        self.assertTrue(post_image_storage.exists(name))
+
+    @override_settings(POST_IMAGE_REUSE_GRACE=60)
+    def test_cleanup_images_removes_stale_files(self):
+        """cleanup_images удаляет картинки без постов после отсрочки"""
+        kept = self.create_post().image.name
+        post = self.create_post('other.png')
+        orphan = post.image.name
+        post.delete()
+        out = StringIO()
+        call_command('cleanup_images', stdout=out)
+        self.assertTrue(post_image_storage.exists(orphan))
+        self.assertIn('Удалено изображений: 0', out.getvalue())
+        expired = time.time() - 61
+        for name in (kept, orphan):
+            os.utime(post_image_storage.path(name), (expired, expired))
+        out = StringIO()
+        call_command('cleanup_images', stdout=out)
+        self.assertFalse(post_image_storage.exists(orphan))
+        self.assertTrue(post_image_storage.exists(kept))
+        self.assertIn('Удалено изображений: 1', out.getvalue())
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0, SQLITE_RETRY_DELAY=0
+)
+class PostWriteRetryTest(TransactionTestCase):
+    def setUp(self):
+        default.kvstore.memory.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.attempts = []
+        post_save.connect(self.lock_once, sender=Post)
+        self.addCleanup(post_save.disconnect, self.lock_once, sender=Post)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def lock_once(self, sender, instance, created, **kwargs):
+        self.attempts.append(created)
+        if len(self.attempts) == 1:
+            raise OperationalError('database is locked')
+
+    def test_retry_stores_image_once(self):
+        """Повтор транзакции создаёт пост, не записывая картинку заново"""
+        with mock.patch.object(
+            post_image_storage, '_save', wraps=post_image_storage._save
+        ) as save:
+            self.client.post(reverse('posts:post_create'), {
+                'text': 'test-text',
+                'image': SimpleUploadedFile('small.gif', SMALL_GIF),
+            })
+        self.assertEqual(self.attempts, [True, True])
+        post = Post.objects.get()
+        image_saves = [
+            call for call in save.call_args_list
+            if not call[0][0].startswith('posts/variants/')
+        ]
+        self.assertEqual(len(image_saves), 1)
+        self.assertTrue(post_image_storage.exists(post.image.name))
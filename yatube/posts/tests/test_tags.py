@@ -0,0 +1,119 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Mention, Post, PostTag, Tag
+from ..tags import parse_mentions, parse_tags
+
+User = get_user_model()
+
+
+class TagsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def test_parse(self):
+        """Теги приводятся к нижнему регистру, сущности HTML не теги"""
+        self.assertEqual(
+            parse_tags('#Котики и #котики, а не&#39;тег #Дом'),
+            {'котики', 'дом'},
+        )
+        self.assertEqual(parse_tags('#' + 'а' * 50), {'а' * 50})
+        self.assertEqual(parse_tags('#' + 'а' * 60), set())
+        self.assertEqual(
+            parse_mentions('Привет, @reader. Пишите на mail@example.com'),
+            {'reader'},
+        )
+
+    def test_entries_follow_text(self):
+        """Теги и упоминания пересобираются при изменении текста"""
+        post = Post.objects.create(
+            text='#котики для @reader и @nobody', author=self.user
+        )
+        self.assertEqual(
+            list(post.tag_entries.values_list('tag__name', flat=True)),
+            ['котики'],
+        )
+        self.assertEqual(
+            list(post.mention_entries.values_list('user', flat=True)),
+            [self.reader.pk],
+        )
+        post.text = '#собаки'
+        post.save()
+        self.assertEqual(
+            list(post.tag_entries.values_list('tag__name', flat=True)),
+            ['собаки'],
+        )
+        self.assertFalse(post.mention_entries.exists())
+
+    @override_settings(POSTS_PER_PAGE=2)
+    def test_feeds(self):
+        """Ленты тега и упоминаний показывают только свои посты"""
+        posts = [
+            Post.objects.create(
+                text=f'#Котики {i} @reader', author=self.user
+            )
+            for i in range(3)
+        ]
+        Post.objects.create(text='без тегов', author=self.user)
+        feeds = (
+            reverse('posts:tag_posts', args=['котики']),
+            reverse('posts:tag_posts', args=['Котики']),
+            reverse('posts:mentions', args=[self.reader.username]),
+        )
+        for url in feeds:
+            with self.subTest(url=url):
+                response = self.guest.get(url)
+                self.assertEqual(
+                    list(response.context['page_obj']),
+                    [posts[2], posts[1]],
+                )
+                cursor = response.context['page_obj'].paginator.next_cursor
+                response = self.guest.get(url, {'after': cursor})
+                self.assertEqual(
+                    list(response.context['page_obj']), [posts[0]]
+                )
+                response = self.guest.get(url, {'page': 2})
+                self.assertEqual(
+                    response.context['page_obj'].paginator.count, 3
+                )
+
+    def test_card_links(self):
+        """В карточке теги и упоминания становятся ссылками"""
+        Post.objects.create(text='#котики для @reader', author=self.user)
+        response = self.guest.get(reverse('posts:index'))
+        self.assertContains(
+            response,
+            f'<a href="{reverse("posts:tag_posts", args=["котики"])}">'
+            f'#котики</a>',
+        )
+        self.assertContains(
+            response,
+            f'<a href="{reverse("posts:mentions", args=["reader"])}">'
+            f'@reader</a>',
+        )
+
+    def test_backfill_command(self):
+        """Команда разбирает теги в старых постах пачками"""
+        posts = Post.objects.bulk_create(
+            Post(text=f'#старое {i} @reader', author=self.user)
+            for i in range(5)
+        )
+        self.assertFalse(PostTag.objects.exists())
+        out = StringIO()
+        call_command('backfill_tags', '--batch-size', '2', stdout=out)
+        self.assertIn('Обработано постов: 5', out.getvalue())
+        tag = Tag.objects.get(name='старое')
+        self.assertEqual(tag.entries.count(), len(posts))
+        self.assertEqual(Mention.objects.filter(user=self.reader).count(), 5)
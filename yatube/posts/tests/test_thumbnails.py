@@ -0,0 +1,241 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+
+from core.testing import immediate_on_commit
+
+from .. import thumbnails, variants
+from ..models import Post, PostImageVariant
+from ..templatetags.post_tags import card_key
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def uploaded_gif(name='small.gif', color=(255, 255, 255)):
+    buffer = BytesIO()
+    Image.new('RGB', (2, 1), color).save(buffer, 'GIF')
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(), content_type='image/gif'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.memory.clear()
+        self.guest = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_placeholder_until_generated(self):
+        """Пока миниатюра не готова, показывается заглушка"""
+        post = Post.objects.create(
+            text='test-text', author=self.user, image=uploaded_gif()
+        )
+        response = self.guest.get(reverse('posts:index'))
+        self.assertContains(response, 'img/placeholder.svg')
+        self.assertIsNone(cache.get(card_key(post)))
+        with immediate_on_commit():
+            thumbnails.generate(post.image.name)
+        for page in (
+            reverse('posts:index'),
+            reverse('posts:post_detail', args=[post.pk]),
+        ):
+            with self.subTest(page=page):
+                response = self.guest.get(page)
+                self.assertNotContains(response, 'img/placeholder.svg')
+                self.assertContains(response, settings.MEDIA_URL + 'cache/')
+        self.assertIsNotNone(cache.get(card_key(post)))
+
+    def test_schedule_on_new_image(self):
+        """Миниатюры ставятся в очередь только для нового изображения"""
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                {'text': 'test-text', 'image': uploaded_gif()},
+            )
+            post = Post.objects.get()
+            schedule.assert_called_once_with(post.image.name)
+            schedule.reset_mock()
+            self.authorized_client.post(
+                reverse('posts:post_edit', args=[post.pk]),
+                {'text': 'new-text'},
+            )
+            schedule.assert_not_called()
+            self.authorized_client.post(
+                reverse('posts:post_edit', args=[post.pk]),
+                {
+                    'text': 'new-text',
+                    'image': uploaded_gif('other.gif', (0, 0, 0)),
+                },
+            )
+            post.refresh_from_db()
+            schedule.assert_called_once_with(post.image.name)
+
+    def test_enqueue_without_workers(self):
+        """Без пула потоков миниатюры создаются сразу"""
+        post = Post.objects.create(
+            text='test-text', author=self.user, image=uploaded_gif()
+        )
+        self.assertTrue(thumbnails.is_pending(post))
+        thumbnails.enqueue(post.image.name)
+        self.assertFalse(
+            thumbnails.is_pending(Post.objects.get(pk=post.pk))
+        )
+
+    def test_generate_thumbnails_command(self):
+        """Команда создаёт миниатюры для старых постов"""
+        post = Post.objects.create(
+            text='test-text', author=self.user, image=uploaded_gif()
+        )
+        out = StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn('Обработано изображений: 1', out.getvalue())
+        self.assertFalse(
+            thumbnails.is_pending(Post.objects.get(pk=post.pk))
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailKVStoreTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.names = []
+        for i in range(3):
+            post = Post.objects.create(
+                text=f'test-text {i}',
+                author=cls.user,
+                image=uploaded_gif(f'small{i}.gif', (i, 0, 0)),
+            )
+            thumbnails.generate(post.image.name)
+            cls.names.append(post.image.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.memory.clear()
+
+    def test_page_resolved_in_one_query(self):
+        """Миниатюры страницы ищутся одним запросом к базе"""
+        with self.assertNumQueries(1):
+            found = thumbnails.get_thumbnails(self.names + ['missing.gif'])
+        self.assertIsNone(found['missing.gif']['card'])
+        for name in self.names:
+            with self.subTest(name=name):
+                self.assertIsNotNone(found[name]['card'])
+        with self.assertNumQueries(0):
+            thumbnails.get_thumbnails(self.names + ['missing.gif'])
+
+    def test_memory_used_before_cache(self):
+        """Найденные миниатюры запоминаются в памяти процесса"""
+        thumbnails.get_thumbnails(self.names)
+        cache.clear()
+        with self.assertNumQueries(0):
+            found = thumbnails.get_thumbnails(self.names)
+        self.assertIsNotNone(found[self.names[0]]['card'])
+
+    @override_settings(THUMBNAIL_LRU_SIZE=2)
+    def test_memory_evicts_least_recent(self):
+        """Память процесса вытесняет давно не использованные ключи"""
+        memory = default.kvstore.memory
+        memory.set('first', 'value')
+        memory.set('second', 'value')
+        memory.get('first')
+        memory.set('third', 'value')
+        self.assertEqual(memory.get('first'), 'value')
+        self.assertIsNone(memory.get('second'))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ImageVariantTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.memory.clear()
+        self.guest = Client()
+        self.post = Post.objects.create(
+            text='test-text', author=self.user, image=uploaded_gif()
+        )
+        thumbnails.generate(self.post.image.name)
+
+    def test_variants_recorded(self):
+        """Для каждой ширины записываются размеры и вес варианта"""
+        formats = variants.available_formats()
+        self.assertIn('webp', formats)
+        found = self.post.image_variants.all()
+        self.assertEqual(
+            len(found), len(formats) * len(settings.POST_IMAGE_WIDTHS)
+        )
+        for variant in found:
+            with self.subTest(width=variant.width):
+                self.assertEqual(variant.source, self.post.image.name)
+                self.assertEqual(
+                    variant.height, round(variant.width * 339 / 960)
+                )
+                self.assertEqual(variant.size, variant.image.size)
+
+    def test_card_srcset(self):
+        """Карточка поста перечисляет варианты в srcset"""
+        response = self.guest.get(reverse('posts:index'))
+        self.assertContains(response, 'type="image/webp"')
+        for variant in self.post.image_variants.all():
+            with self.subTest(width=variant.width):
+                self.assertContains(
+                    response, f'{variant.image.url} {variant.width}w'
+                )
+
+    def test_stale_variants_removed(self):
+        """Замена изображения удаляет старые варианты и их файлы"""
+        old = list(self.post.image_variants.all())
+        self.post.image = uploaded_gif('other.gif', (0, 0, 0))
+        self.post.save()
+        thumbnails.generate(self.post.image.name)
+        self.assertFalse(
+            PostImageVariant.objects.filter(
+                pk__in=[variant.pk for variant in old]
+            ).exists()
+        )
+        for variant in old:
+            with self.subTest(width=variant.width):
+                self.assertFalse(
+                    variant.image.storage.exists(variant.image.name)
+                )
+        self.assertTrue(self.post.image_variants.exists())
@@ -0,0 +1,121 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.user = User.objects.create_user(username='user')
+        cls.old_post = Post.objects.create(text='old', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def follow_feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_timeline(self):
+        """Подписка переносит посты автора в ленту подписчика"""
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.user, post=self.old_post
+            ).exists()
+        )
+        self.assertEqual(self.follow_feed(), [self.old_post])
+
+    @override_settings(TIMELINE_BACKFILL=2)
+    def test_follow_backfills_all_posts(self):
+        """В ленту попадают все посты автора, а не только последние"""
+        Post.objects.bulk_create(
+            Post(text=f'post {i}', author=self.author) for i in range(4)
+        )
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user).count(), 5
+        )
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков при записи"""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='new', author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+        self.assertEqual(self.follow_feed(), [post, self.old_post])
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты"""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user).exists()
+        )
+        self.assertEqual(self.follow_feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_is_read_on_demand(self):
+        """Посты популярных авторов не раскладываются, а читаются из ленты"""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='new', author=self.author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+        self.assertEqual(self.follow_feed(), [post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_follow_popular_author_skips_backfill(self):
+        """Подписка на популярного автора не переносит его посты в ленту"""
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user).exists()
+        )
+        self.assertEqual(self.follow_feed(), [self.old_post])
+
+    @override_settings(POSTS_PER_PAGE=3)
+    def test_merged_feed_pages(self):
+        """Лента с популярными авторами листается без пропусков и повторов"""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.user, author=other)
+        for i in range(4):
+            Post.objects.create(text=f'author {i}', author=self.author)
+            Post.objects.create(text=f'other {i}', author=other)
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        with override_settings(TIMELINE_FANOUT_LIMIT=0):
+            # Записи, разложенные до того, как автор стал популярным,
+            # остаются в ленте и не должны повторяться.
+            pages, params = [], {}
+            while True:
+                response = self.client.get(
+                    reverse('posts:follow_index'), params
+                )
+                pages.extend(response.context['page_obj'])
+                cursor = response.context['page_obj'].paginator.next_cursor
+                if not cursor:
+                    break
+                params = {'after': cursor}
+            numbered = self.client.get(
+                reverse('posts:follow_index'), {'page': 2}
+            )
+        self.assertEqual(pages, expected)
+        self.assertEqual(list(numbered.context['page_obj']), expected[3:6])
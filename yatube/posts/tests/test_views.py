@@ -1,9 +1,14 @@
 from django import forms
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from core.testing import QueryBudgetTestMixin
+
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -75,6 +80,7 @@ class PostPageTest(TestCase):
         """"Проверка контекста group_list_, profile, post_detail"""
         for page in self.get_reverse_without_paginator:
             with self.subTest(page=page):
+                cache.clear()
                 response = self.authorized_client.get(page)
                 post = response.context.get('post')
                 self.assertEqual(post.group.title, 'test-title')
@@ -135,6 +141,7 @@ class TestPaginatorView(TestCase):
 
     def setUp(self):
         self.guest = Client()
+        cache.clear()
 
     def test_paginator_first_page(self):
         for page in self.paginator:
@@ -260,3 +267,246 @@ class FollowingTest(TestCase):
         )
         self.assertEqual(self.post_count, unfollower_post_count)
         self.assertEqual(self.post_count, unfollower_new_post_count)
+
+
+class TestCursorPaginatorView(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='test-title',
+            slug='test-slug',
+            description='test-description',
+        )
+        Post.objects.bulk_create(
+            Post(
+                text=f'test-text {i}',
+                group=cls.group,
+                author=cls.user,
+            ) for i in range(13)
+        )
+        cls.paginator = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.user.username]),
+        ]
+
+    def setUp(self):
+        self.guest = Client()
+
+    def test_cursor_pages(self):
+        """Курсоры ведут на следующую и предыдущую страницы"""
+        for page in self.paginator:
+            with self.subTest(page=page):
+                response = self.guest.get(page)
+                page_obj = response.context['page_obj']
+                first_page = list(page_obj)
+                response = self.guest.get(
+                    page, {'after': page_obj.paginator.next_cursor}
+                )
+                second_page = list(response.context['page_obj'])
+                self.assertEqual(len(second_page), 3)
+                self.assertFalse(set(first_page) & set(second_page))
+                previous_cursor = (
+                    response.context['page_obj'].paginator.previous_cursor
+                )
+                response = self.guest.get(page, {'before': previous_cursor})
+                self.assertEqual(
+                    list(response.context['page_obj']), first_page
+                )
+
+    def test_cursor_page_without_count(self):
+        """Постраничный вывод по курсору не считает все записи"""
+        response = self.guest.get(self.paginator[0])
+        next_cursor = response.context['page_obj'].paginator.next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            self.guest.get(self.paginator[0], {'after': next_cursor})
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_invalid_cursor(self):
+        """Некорректный курсор открывает первую страницу"""
+        response = self.guest.get(self.paginator[0], {'after': 'broken'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+
+class PostDetailQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='test-title',
+            slug='test-slug',
+            description='test-description',
+        )
+        cls.post = Post.objects.create(
+            text='test-text',
+            author=cls.user,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        self.guest = Client()
+
+    def test_post_detail_queries_do_not_grow(self):
+        """Число запросов post_detail не зависит от числа комментариев"""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        for comments in (1, 20):
+            with self.subTest(comments=comments):
+                for i in range(comments):
+                    commentator = User.objects.create_user(
+                        username=f'commentator-{comments}-{i}'
+                    )
+                    Comment.objects.create(
+                        post=self.post, author=commentator, text='comment'
+                    )
+                with self.assertNumQueries(3):
+                    response = self.guest.get(url)
+                self.assertEqual(
+                    response.context['post'].author.stats.posts_count, 1
+                )
+
+    def test_author_posts_count(self):
+        """Счётчик постов автора меняется при создании и удалении"""
+        post = Post.objects.create(text='new-text', author=self.user)
+        self.user.stats.refresh_from_db()
+        self.assertEqual(self.user.stats.posts_count, 2)
+        post.delete()
+        self.user.stats.refresh_from_db()
+        self.assertEqual(self.user.stats.posts_count, 1)
+
+
+@override_settings(COMMENTS_PER_PAGE=3)
+class PostCommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='test-text', author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'comment {i}')
+            for i in range(5)
+        )
+
+    def setUp(self):
+        self.guest = Client()
+
+    def test_post_detail_first_comments(self):
+        """На странице поста выводится только первая порция комментариев"""
+        response = self.guest.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        )
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            ['comment 0', 'comment 1', 'comment 2'],
+        )
+        self.assertIsNotNone(comments.paginator.next_cursor)
+
+    def test_more_comments_fragment(self):
+        """Следующая порция комментариев отдаётся HTML-фрагментом"""
+        response = self.guest.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        )
+        cursor = response.context['comments'].paginator.next_cursor
+        response = self.guest.get(
+            reverse('posts:post_comments', args=[self.post.id]),
+            {'after': cursor},
+        )
+        self.assertTemplateUsed(response, 'posts/comments.html')
+        self.assertContains(response, 'comment 4')
+        self.assertNotContains(response, 'comment 2')
+
+    def test_more_comments_json(self):
+        """Комментарии отдаются в JSON со ссылкой на следующую порцию"""
+        url = reverse('posts:post_comments', args=[self.post.id])
+        response = self.guest.get(url, HTTP_ACCEPT='application/json')
+        data = response.json()
+        self.assertEqual(len(data['comments']), 3)
+        self.assertEqual(data['comments'][0]['author'], 'auth')
+        response = self.guest.get(
+            data['next'], HTTP_ACCEPT='application/json'
+        )
+        data = response.json()
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            ['comment 3', 'comment 4'],
+        )
+        self.assertIsNone(data['next'])
+
+
+class QueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='test-title',
+            slug='test-slug',
+            description='test-description',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(12):
+            cls.post = Post.objects.create(
+                text=f'test-text {i}', author=cls.author, group=cls.group
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text='comment'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_read_views_within_budget(self):
+        """Представления укладываются в бюджет запросов"""
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('posts:post_comments', args=[self.post.id]),
+            reverse('posts:follow_index'),
+            reverse('posts:post_create'),
+        ]
+        for page in pages:
+            for params in ({}, {'page': 2}):
+                with self.subTest(page=page, params=params):
+                    self.assertWithinQueryBudget(
+                        self.authorized_client.get(page, params)
+                    )
+
+    def test_write_views_within_budget(self):
+        """Запись поста, комментария и подписки укладывается в бюджет"""
+        requests = [
+            (reverse('posts:post_create'), {'text': 'new-text'}),
+            (reverse('posts:add_comment', args=[self.post.id]),
+             {'text': 'new-comment'}),
+            (reverse('posts:profile_unfollow', args=[self.author]), None),
+            (reverse('posts:profile_follow', args=[self.author]), None),
+        ]
+        for url, data in requests:
+            with self.subTest(url=url):
+                response = (
+                    self.authorized_client.post(url, data)
+                    if data else self.authorized_client.get(url)
+                )
+                self.assertWithinQueryBudget(response)
+
+    def test_profile_follow_state_in_author_query(self):
+        """Подписка на автора читается тем же запросом, что и автор"""
+        url = reverse('posts:profile', args=[self.author.username])
+        guest_queries = self.guest.get(url).query_stats['queries']
+        response = self.authorized_client.get(url)
+        self.assertTrue(response.context['following'])
+        # Сессия и пользователь — единственные добавочные запросы,
+        # зато гостю нужен ещё запрос ключей для ETag.
+        self.assertEqual(
+            response.query_stats['queries'], guest_queries + 2 - 1
+        )
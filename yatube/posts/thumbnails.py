@@ -0,0 +1,195 @@
+"""Миниатюры изображений постов, которые готовятся заранее.
+
+Шаблоны не режут изображения при рендере: они читают только уже
+созданные миниатюры размеров из settings.POST_THUMBNAILS, а пока
+миниатюра готовится, показывают заглушку. Миниатюры создаются пулом
+потоков после сохранения поста; при THUMBNAIL_WORKERS = 0 — сразу.
+Вместе с миниатюрами создаются варианты изображения для srcset.
+Готовые миниатюры сбрасывают кэш лент, в которых показан пост.
+Картинки без постов удаляет команда cleanup_images.
+"""
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import prefetch_related_objects
+from sorl.thumbnail import default
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import feed_cache, variants
+from .models import Post
+from .storage import post_image_storage
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+class ExistingThumbnailBackend(ThumbnailBackend):
+    """Находит файл миниатюры, не создавая её."""
+
+    def get_thumbnail_file(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+backend = ExistingThumbnailBackend()
+
+
+def get_thumbnails(names):
+    """Готовые миниатюры {имя: {размер: ImageFile или None}} разом.
+
+    Все миниатюры ищутся одним обращением к хранилищу метаданных.
+    """
+    files = {
+        name: {
+            size: backend.get_thumbnail_file(name, geometry, **options)
+            for size, (geometry, options) in settings.POST_THUMBNAILS.items()
+        }
+        for name in set(names)
+        if name
+    }
+    found = default.kvstore.get_many(
+        file_ for sizes in files.values() for file_ in sizes.values()
+    )
+    return {
+        name: {size: found[file_.key] for size, file_ in sizes.items()}
+        for name, sizes in files.items()
+    }
+
+
+def prefetch(posts):
+    """Загружает миниатюры и варианты изображений постов разом."""
+    found = get_thumbnails(post.image.name for post in posts)
+    for post in posts:
+        post.thumbnails = found.get(post.image.name, {})
+    prefetch_related_objects(
+        [post for post in posts if post.image], 'image_variants'
+    )
+
+
+def get_thumbnail(post, size):
+    """Готовая миниатюра размера size или None, пока её нет."""
+    if not hasattr(post, 'thumbnails'):
+        prefetch([post])
+    return post.thumbnails.get(size)
+
+
+def is_pending(post):
+    if not hasattr(post, 'thumbnails'):
+        prefetch([post])
+    if None in post.thumbnails.values():
+        return True
+    return bool(
+        post.image
+        and variants.available_formats()
+        and not post.image_variants.all()
+    )
+
+
+def generate(name):
+    for geometry, options in settings.POST_THUMBNAILS.values():
+        backend.get_thumbnail(name, geometry, **options)
+    keys = []
+    for post in Post.objects.filter(image=name):
+        variants.create_variants(post)
+        keys.extend(feed_cache.post_version_keys(post))
+    # Закэшированные ленты ещё показывают заглушку вместо миниатюры.
+    feed_cache.bump_versions(keys)
+
+
+def _generate_safely(name):
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+
+
+def _generate_in_worker(name):
+    close_old_connections()
+    try:
+        _generate_safely(name)
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def _workers_enabled():
+    # Таблицы базы SQLite в памяти другие потоки получают заблокированными
+    # без ожидания, поэтому с такой базой миниатюры создаются сразу.
+    in_memory = connection.vendor == 'sqlite' and connection.is_in_memory_db()
+    return settings.THUMBNAIL_WORKERS and not in_memory
+
+
+def enqueue(name):
+    if not _workers_enabled():
+        _generate_safely(name)
+        return None
+    return _get_executor().submit(_generate_in_worker, name)
+
+
+def release(name):
+    """Удаляет картинку и её миниатюры, если на неё не ссылаются посты.
+
+    Только что загруженную картинку может ещё сохранять другой пост,
+    поэтому она остаётся до конца POST_IMAGE_REUSE_GRACE, а удаляет её
+    затем sweep. Возвращает True, если картинка удалена.
+    """
+    if not name:
+        return False
+    with post_image_storage.lock():
+        if Post.objects.filter(image=name).exists():
+            return False
+        if post_image_storage.recently_saved(name):
+            return False
+        try:
+            delete_thumbnails(name)
+        except Exception:
+            logger.exception('Не удалось удалить картинку %s', name)
+            return False
+    return True
+
+
+def sweep():
+    """Удаляет картинки постов, на которые не осталось ссылок.
+
+    Подбирает картинки, которые release оставил как только что
+    загруженные, и те, что остались после сбоя. Возвращает их число.
+    """
+    directory = Post._meta.get_field('image').upload_to
+    try:
+        files = post_image_storage.listdir(directory)[1]
+    except FileNotFoundError:
+        return 0
+    return sum(
+        release(posixpath.join(directory, filename)) for filename in files
+    )
+
+
+def schedule(name):
+    """Ставит создание миниатюр в очередь после фиксации транзакции."""
+    transaction.on_commit(lambda: enqueue(name))
@@ -0,0 +1,186 @@
+"""Лента подписок, которая раскладывается по подписчикам при записи.
+
+Новый пост сразу добавляется в ленты всех подписчиков автора, поэтому
+follow_index читает готовую ленту. Посты авторов, у которых подписчиков
+больше settings.TIMELINE_FANOUT_LIMIT, не раскладываются: такие авторы
+подмешиваются в ленту при чтении.
+"""
+import heapq
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.db.models import F, Q
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+FEED_ORDERING = ('-feed_date', '-feed_post')
+
+
+def followers_count(author_id):
+    return (
+        UserStats.objects.filter(user_id=author_id)
+        .values_list('followers_count', flat=True)
+        .first()
+    ) or 0
+
+
+def is_pull_author(author_id):
+    return followers_count(author_id) > settings.TIMELINE_FANOUT_LIMIT
+
+
+def pull_author_ids(user):
+    return UserStats.objects.filter(
+        user__following__user=user,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('user_id', flat=True)
+
+
+def fan_out(post):
+    if is_pull_author(post.author_id):
+        return
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in Follow.objects.filter(
+                author_id=post.author_id
+            ).values_list('user_id', flat=True)
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_ids, author_id):
+    """Переносит все посты автора в ленты user_ids.
+
+    За одну вставку пишется не больше settings.TIMELINE_BACKFILL
+    записей, поэтому память не зависит от числа постов автора.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    batch_size = max(settings.TIMELINE_BACKFILL // len(user_ids), 1)
+    posts = Post.objects.filter(author_id=author_id).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(
+            posts.filter(pk__gt=last_pk)
+            .values_list('pk', 'pub_date')[:batch_size]
+        )
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(
+                    user_id=user_id, post_id=post_id, pub_date=pub_date
+                )
+                for user_id in user_ids
+                for post_id, pub_date in batch
+            ),
+            ignore_conflicts=True,
+        )
+        last_pk = batch[-1][0]
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def feed_key(post):
+    return post.feed_date, post.feed_post
+
+
+class MergedFeed:
+    """Лента из нескольких запросов, упорядоченных по FEED_ORDERING.
+
+    Срез читает из каждого запроса не больше строк, чем нужно срезу,
+    по индексу этого запроса, и сливает их в памяти; пост, попавший
+    в несколько запросов, берётся один раз. Поддерживает ту часть API
+    QuerySet, которой пользуются пагинаторы.
+    """
+
+    ordered = True
+
+    def __init__(self, querysets, count_queryset, descending=True):
+        self.querysets = querysets
+        self.count_queryset = count_queryset
+        self.descending = descending
+
+    def _apply(self, method, *args, descending=None, **kwargs):
+        return MergedFeed(
+            [
+                getattr(queryset, method)(*args, **kwargs)
+                for queryset in self.querysets
+            ],
+            self.count_queryset,
+            self.descending if descending is None else descending,
+        )
+
+    def filter(self, *args, **kwargs):
+        return self._apply('filter', *args, **kwargs)
+
+    def select_related(self, *fields):
+        return self._apply('select_related', *fields)
+
+    def order_by(self, *ordering):
+        return self._apply(
+            'order_by', *ordering, descending=ordering[0].startswith('-')
+        )
+
+    def reverse(self):
+        return self._apply('reverse', descending=not self.descending)
+
+    def count(self):
+        return self.count_queryset.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            try:
+                return self[key:key + 1][0]
+            except IndexError:
+                raise IndexError('Индекс за пределами ленты') from None
+        if key.step is not None or (key.start or 0) < 0:
+            raise ValueError('Поддерживаются только срезы с начала ленты')
+        merged = heapq.merge(
+            *(queryset[:key.stop] for queryset in self.querysets),
+            key=feed_key,
+            reverse=self.descending,
+        )
+        unique = (next(group) for _, group in groupby(merged, feed_key))
+        return list(islice(unique, key.start, key.stop))
+
+
+def timeline_feed(user):
+    return Post.objects.filter(timeline_entries__user=user).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_post=F('timeline_entries__post'),
+    ).order_by(*FEED_ORDERING)
+
+
+def author_feed(author_id):
+    return Post.objects.filter(author_id=author_id).annotate(
+        feed_date=F('pub_date'),
+        feed_post=F('pk'),
+    ).order_by(*FEED_ORDERING)
+
+
+def follow_feed(user):
+    """Лента подписок, упорядоченная по FEED_ORDERING.
+
+    Без популярных авторов лента читается по индексу записей ленты
+    подписчика. Иначе страница сливается из страницы этой ленты и
+    страниц каждого популярного автора по индексу его постов.
+    """
+    pull_authors = list(pull_author_ids(user))
+    if not pull_authors:
+        return timeline_feed(user)
+    return MergedFeed(
+        [timeline_feed(user)] + [
+            author_feed(author_id) for author_id in pull_authors
+        ],
+        Post.objects.filter(
+            Q(pk__in=TimelineEntry.objects.filter(user=user).values('post'))
+            | Q(author__in=pull_authors)
+        ),
+    )
@@ -0,0 +1,129 @@
+"""Приём изображений постов с ограниченным расходом памяти.
+
+Загрузка потоково пишется на диск стандартными обработчиками Django;
+в представлениях с limit_image_uploads перед ними стоит
+ImageUploadLimitHandler, который перестаёт принимать файл, как только
+он превысил settings.POST_IMAGE_MAX_BYTES.
+
+Размеры изображения проверяются по заголовку до декодирования. Только
+JPEG декодируется сразу в уменьшенном масштабе (draft), поэтому для него
+действует предел settings.POST_IMAGE_MAX_PIXELS, а остальные форматы
+декодируются целиком и ограничены settings.POST_IMAGE_MAX_DECODED_PIXELS.
+Анимированные изображения не принимаются: сохранился бы только первый
+кадр.
+"""
+import os
+from collections import namedtuple
+from functools import wraps
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image, ImageOps
+
+METADATA_KEYS = ('exif', 'comment', 'xmp', 'XML:com.adobe.xmp', 'photoshop')
+SAVE_FORMATS = {'MPO': 'JPEG'}
+
+# Форматы, которые Pillow умеет декодировать в уменьшенном масштабе.
+DRAFT_FORMATS = ('JPEG', 'MPO')
+
+ImageHeader = namedtuple('ImageHeader', 'width height pixel_limit animated')
+
+# Форматы, которые Pillow умеет читать, но не умеет записывать,
+# сохраняются в PNG.
+FALLBACK_FORMAT = 'PNG'
+FALLBACK_MODES = ('1', 'L', 'LA', 'I', 'P', 'RGB', 'RGBA')
+
+
+class OversizedUpload(UploadedFile):
+    """Метка файла, отброшенного из-за превышения размера."""
+
+    oversized = True
+
+    def __init__(self, name, content_type, size, charset):
+        super().__init__(BytesIO(), name, content_type, size, charset)
+
+
+class ImageUploadLimitHandler(FileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            return OversizedUpload(
+                self.file_name, self.content_type, self.received,
+                self.charset,
+            )
+        return None
+
+
+def limit_image_uploads(view):
+    """Ставит ImageUploadLimitHandler первым обработчиком загрузок view.
+
+    Обработчики нельзя менять после чтения request.POST, а его читает
+    CsrfViewMiddleware, поэтому CSRF проверяется внутри, как описано
+    в документации Django.
+    """
+    protected_view = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers.insert(0, ImageUploadLimitHandler(request))
+        return protected_view(request, *args, **kwargs)
+    return wrapper
+
+
+def read_header(upload):
+    """Сведения об изображении по заголовку файла, без декодирования.
+
+    Дополнительные снимки MPO — превью и стереопары, а не анимация.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        width, height = image.size
+        if image.format in DRAFT_FORMATS:
+            pixel_limit = settings.POST_IMAGE_MAX_PIXELS
+        else:
+            pixel_limit = settings.POST_IMAGE_MAX_DECODED_PIXELS
+        animated = (
+            image.format not in SAVE_FORMATS
+            and getattr(image, 'is_animated', False)
+        )
+    return ImageHeader(width, height, pixel_limit, animated)
+
+
+def normalize_image(upload):
+    """Уменьшает изображение до POST_IMAGE_MAX_SIDE и удаляет метаданные."""
+    max_size = (settings.POST_IMAGE_MAX_SIDE, settings.POST_IMAGE_MAX_SIDE)
+    upload.seek(0)
+    image = Image.open(upload)
+    image_format = SAVE_FORMATS.get(image.format, image.format)
+    name, content_type = upload.name, upload.content_type
+    image.draft(image.mode, max_size)
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(max_size, Image.LANCZOS)
+    Image.init()
+    if image_format not in Image.SAVE:
+        image_format = FALLBACK_FORMAT
+        name = os.path.splitext(name)[0] + '.png'
+        content_type = 'image/png'
+        if image.mode not in FALLBACK_MODES:
+            image = image.convert('RGBA')
+    for key in METADATA_KEYS:
+        image.info.pop(key, None)
+    buffer = BytesIO()
+    if image_format == 'JPEG':
+        image.save(buffer, image_format, quality=90, optimize=True)
+    else:
+        image.save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type)
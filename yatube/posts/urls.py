@@ -9,7 +9,14 @@ urlpatterns = [
     path('create/', views.post_create, name='post_create'),
     path('follow/', views.follow_index, name='follow_index'),
     path('group/<slug:slug>/', views.group_list, name='group_list'),
+    path('search/', views.post_search, name='post_search'),
+    path('tag/<str:name>/', views.tag_posts, name='tag_posts'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
@@ -17,6 +24,11 @@ urlpatterns = [
     ),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/mentions/',
+        views.mentions,
+        name='mentions'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -0,0 +1,120 @@
+"""Варианты изображения поста разной ширины для атрибута srcset.
+
+Варианты кадрируются так же, как миниатюра карточки, и сохраняются
+в современных форматах из settings.POST_IMAGE_FORMATS, которые умеет
+записывать установленный Pillow. Размеры и вес каждого варианта
+хранятся в PostImageVariant, поэтому шаблон строит srcset без
+обращения к файлам.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .models import PostImageVariant
+
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+
+
+def available_formats():
+    Image.init()
+    return [
+        name for name in settings.POST_IMAGE_FORMATS
+        if name.upper() in Image.SAVE
+    ]
+
+
+def aspect_ratio():
+    geometry, _ = settings.POST_THUMBNAILS['card']
+    width, height = geometry.split('x')
+    return int(height) / int(width)
+
+
+def _render(source, width, height, image_format):
+    image = ImageOps.fit(source, (width, height), Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(
+        buffer,
+        image_format.upper(),
+        quality=settings.POST_IMAGE_QUALITY,
+    )
+    return buffer.getvalue()
+
+
+def _open_source(image):
+    with image.open('rb') as image_file:
+        source = Image.open(image_file)
+        source.load()
+    return source.convert('RGBA' if 'A' in source.getbands() else 'RGB')
+
+
+def create_variants(post):
+    """Создаёт недостающие варианты изображения и удаляет устаревшие."""
+    stale = post.image_variants.exclude(source=post.image.name)
+    for variant in stale:
+        variant.delete()
+    if not post.image:
+        return []
+    existing = set(
+        post.image_variants.values_list('format', 'width')
+    )
+    # Одинаковые картинки хранятся одним файлом, поэтому варианты другого
+    # поста с тем же исходным файлом подходят без повторного кодирования.
+    shared = {
+        (variant.format, variant.width): variant
+        for variant in PostImageVariant.objects.filter(
+            source=post.image.name
+        ).exclude(post=post)
+    }
+    ratio = aspect_ratio()
+    source = None
+    variants = []
+    for image_format in available_formats():
+        for width in settings.POST_IMAGE_WIDTHS:
+            if (image_format, width) in existing:
+                continue
+            variant = PostImageVariant(
+                post=post,
+                source=post.image.name,
+                format=image_format,
+                width=width,
+            )
+            if (image_format, width) in shared:
+                original = shared[image_format, width]
+                variant.height = original.height
+                variant.size = original.size
+                variant.image = original.image.name
+                variants.append(variant)
+                continue
+            if source is None:
+                source = _open_source(post.image)
+            variant.height = round(width * ratio)
+            content = _render(source, width, variant.height, image_format)
+            variant.size = len(content)
+            variant.image.save(
+                f'{post.pk}-{width}.{image_format}',
+                ContentFile(content),
+                save=False,
+            )
+            variants.append(variant)
+    PostImageVariant.objects.bulk_create(variants, ignore_conflicts=True)
+    return variants
+
+
+def srcsets(variants):
+    """Список (MIME-тип, srcset) по форматам, лучший формат первым."""
+    by_format = {}
+    for variant in variants:
+        by_format.setdefault(variant.format, []).append(
+            f'{variant.image.url} {variant.width}w'
+        )
+    return [
+        (MIME_TYPES[name], ', '.join(by_format[name]))
+        for name in settings.POST_IMAGE_FORMATS
+        if name in by_format
+    ]
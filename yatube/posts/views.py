@@ -1,57 +1,199 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db.models import Exists, OuterRef
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils.http import urlencode
 
+from core.sqlite import serialized_write
+
+from . import feed_cache, feed_counts, search, tags, timeline
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
+from .http_cache import cache_policy
+from .models import Follow, Group, Post, Tag, User
+from .paginators import CountedPaginator, CursorPaginator
+from .uploads import limit_image_uploads
 
 
-def paginate_queryset(request, post_list):
-    post = Paginator(post_list, settings.POSTS_PER_PAGE)
+def paginate_queryset(request, post_list, count_key,
+                      ordering=('-pub_date', '-pk')):
     page_number = request.GET.get('page')
-    page_obj = post.get_page(page_number)
-    return page_obj
+    if page_number:
+        post = CountedPaginator(
+            post_list,
+            settings.POSTS_PER_PAGE,
+            feed_counts.get_count(count_key, post_list),
+        )
+        return post.get_page(page_number)
+    post = CursorPaginator(post_list, settings.POSTS_PER_PAGE, ordering)
+    return post.get_cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+
+
+def paginate_comments(request, comment_list):
+    comments = CursorPaginator(
+        comment_list.select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        ordering=('created', 'pk'),
+    )
+    return comments.get_cursor_page(after=request.GET.get('after'))
+
+
+def index_versions(request):
+    return [feed_cache.version_key(feed_cache.INDEX)]
+
+
+def group_versions(request, slug):
+    group_id = Group.objects.filter(
+        slug=slug
+    ).values_list('pk', flat=True).first()
+    if group_id is None:
+        return None
+    return [feed_cache.version_key(feed_cache.GROUP, group_id)]
+
+
+def profile_versions(request, username):
+    author_id = User.objects.filter(
+        username=username
+    ).values_list('pk', flat=True).first()
+    if author_id is None:
+        return None
+    return [
+        feed_cache.version_key(feed_cache.AUTHOR, author_id),
+        feed_cache.version_key(feed_cache.FOLLOW, author_id),
+    ]
+
 
+def post_versions(request, post_id):
+    post = Post.objects.filter(
+        pk=post_id
+    ).values_list('author_id', 'group_id').first()
+    if post is None:
+        return None
+    author_id, group_id = post
+    keys = [
+        feed_cache.version_key(feed_cache.POST, post_id),
+        feed_cache.version_key(feed_cache.AUTHOR, author_id),
+    ]
+    if group_id:
+        keys.append(feed_cache.version_key(feed_cache.GROUP, group_id))
+    return keys
 
+
+@cache_policy(index_versions)
 def index(request):
-    post_list = Post.objects.select_related()
+    post_list = Post.objects.select_related('author', 'group')
+    page_obj = paginate_queryset(
+        request, post_list, feed_counts.feed_key(feed_counts.GLOBAL)
+    )
     return render(request, 'posts/index.html', {
-        'page_obj': paginate_queryset(request, post_list)
+        'page_obj': page_obj,
+        'feed_cache': feed_cache.fragment_context(
+            index_versions(request), page_obj
+        ),
     })
 
 
+@cache_policy(group_versions)
 def group_list(request, slug):
     group = get_object_or_404(Group, slug=slug)
     post_list = group.posts.select_related('author')
+    page_obj = paginate_queryset(
+        request,
+        post_list,
+        feed_counts.feed_key(feed_counts.GROUP, group.pk),
+    )
     context = {
         'group': group,
-        'page_obj': paginate_queryset(request, post_list),
+        'page_obj': page_obj,
+        'feed_cache': feed_cache.fragment_context(
+            [feed_cache.version_key(feed_cache.GROUP, group.pk)], page_obj
+        ),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_policy(profile_versions)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.select_related('group')
-    following = False
+    authors = User.objects.select_related('stats')
     if request.user.is_authenticated:
-        following = Follow.objects.filter(
+        authors = authors.annotate(is_followed=Exists(Follow.objects.filter(
             user=request.user,
-            author=author,
-        ).exists()
+            author=OuterRef('pk'),
+        )))
+    author = get_object_or_404(authors, username=username)
+    post_list = author.posts.select_related('group')
+    following = getattr(author, 'is_followed', False)
+    page_obj = paginate_queryset(
+        request,
+        post_list,
+        feed_counts.feed_key(feed_counts.AUTHOR, author.pk),
+    )
     context = {
-        'page_obj': paginate_queryset(request, post_list),
+        'page_obj': page_obj,
+        'feed_cache': feed_cache.fragment_context(
+            [feed_cache.version_key(feed_cache.AUTHOR, author.pk)], page_obj
+        ),
         'author': author,
         'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+def tag_posts(request, name):
+    tag = get_object_or_404(Tag, name=name.lower())
+    post_list = tags.tag_feed(tag).select_related('author', 'group')
+    context = {
+        'tag': tag,
+        'page_obj': paginate_queryset(
+            request,
+            post_list,
+            feed_counts.feed_key(feed_counts.TAG, tag.pk),
+            timeline.FEED_ORDERING,
+        ),
+    }
+    return render(request, 'posts/tag.html', context)
+
+
+def mentions(request, username):
+    author = get_object_or_404(User, username=username)
+    post_list = tags.mentions_feed(author).select_related('author', 'group')
+    context = {
+        'author': author,
+        'page_obj': paginate_queryset(
+            request,
+            post_list,
+            feed_counts.feed_key(feed_counts.MENTION, author.pk),
+            timeline.FEED_ORDERING,
+        ),
+    }
+    return render(request, 'posts/mentions.html', context)
+
+
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    post_list = search.search_posts(query).select_related('author', 'group')
+    page_obj = CountedPaginator(
+        post_list, settings.POSTS_PER_PAGE, post_list.count()
+    ).get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_prefix': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@cache_policy(post_versions)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
     form = CommentForm(request.POST or None)
-    comments = Comment.objects.filter(post=post_id)
+    comments = paginate_comments(request, post.comments)
     context = {
         'post': post,
         'form': form,
@@ -60,7 +202,63 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = paginate_comments(request, post.comments)
+    if 'application/json' in request.META.get('HTTP_ACCEPT', ''):
+        next_cursor = comments.paginator.next_cursor
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next': next_cursor and (
+                reverse('posts:post_comments', args=[post_id])
+                + f'?after={next_cursor}'
+            ),
+        })
+    return render(request, 'posts/comments.html', {
+        'comments': comments,
+        'post_id': post.pk,
+    })
+
+
+def store_image(post):
+    """Записывает новую картинку поста до транзакции его сохранения.
+
+    Так запись файла не держит блокировку записи и не повторяется,
+    если транзакцию придётся повторить.
+    """
+    image = post.image
+    if image and not image._committed:
+        image.save(image.name, image.file, save=False)
+
+
+@serialized_write
+def save_object(obj, created=False):
+    if created:
+        # Откаченная попытка могла успеть присвоить объекту id.
+        obj.pk = None
+    obj.save()
+
+
+@serialized_write
+def follow(user, author):
+    Follow.objects.get_or_create(user=user, author=author)
+
+
+@serialized_write
+def unfollow(user, username):
+    Follow.objects.filter(user=user, author__username=username).delete()
+
+
 @login_required
+@limit_image_uploads
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -69,12 +267,14 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        store_image(post)
+        save_object(post, created=True)
         return redirect('posts:profile', username=post.author.username)
     return render(request, 'posts/create_post.html', {'form': form})
 
 
 @login_required
+@limit_image_uploads
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if not request.user == post.author:
@@ -85,7 +285,8 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        post.save()
+        store_image(post)
+        save_object(post)
         return redirect('posts:post_detail', post_id=post.pk)
     return render(request, 'posts/create_post.html', {'form': form})
 
@@ -98,18 +299,22 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        save_object(comment, created=True)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    page_obj = (
-        Post.objects.select_related()
-        .filter(author__following__user=request.user)
+    page_obj = timeline.follow_feed(request.user).select_related(
+        'author', 'group'
     )
     context = {
-        'page_obj': paginate_queryset(request, page_obj)
+        'page_obj': paginate_queryset(
+            request,
+            page_obj,
+            feed_counts.feed_key(feed_counts.FOLLOW, request.user.pk),
+            timeline.FEED_ORDERING,
+        )
     }
     return render(request, 'posts/follow.html', context)
 
@@ -118,17 +323,11 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
-        Follow.objects.get_or_create(
-            user=request.user,
-            author=author,
-        )
+        follow(request.user, author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    Follow.objects.filter(
-        user=request.user,
-        author__username=username,
-    ).delete()
+    unfollow(request.user, username)
     return redirect('posts:profile', username=username)
@@ -0,0 +1,73 @@
+"""Настройки CACHES из переменных окружения.
+
+CACHE_URL — общий для всех процессов кэш, например
+file:///var/tmp/yatube-cache, memcached://127.0.0.1:11211 или
+redis://127.0.0.1:6379/1 (нужны python-memcached и django-redis
+соответственно); по умолчанию locmem:// — память одного процесса.
+Перед общим кэшем стоит core.cache.TieredCache с памятью процесса
+на CACHE_LOCAL_MAX_ENTRIES записей, 0 отключает её.
+"""
+from urllib.parse import unquote, urlsplit
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+    'redis': 'django_redis.cache.RedisCache',
+}
+
+# Значения под этими ключами не меняются: новая версия ленты или
+# новое содержимое поста дают новый ключ.
+LOCAL_PREFIXES = ('template.cache.', 'post_card:')
+
+DEFAULT_LOCAL_MAX_ENTRIES = 1000
+
+DEFAULT_LOCAL_TIMEOUT = 300
+
+
+class CacheConfigError(ValueError):
+    pass
+
+
+def parse_cache_url(url):
+    """Словарь настроек одного кэша по его адресу."""
+    parts = urlsplit(url)
+    backend = BACKENDS.get(parts.scheme)
+    if backend is None:
+        raise CacheConfigError(f'Неизвестная схема кэша: {url!r}')
+    if parts.scheme == 'locmem':
+        location = parts.netloc or 'yatube'
+    elif parts.scheme == 'file':
+        location = unquote(parts.path)
+        if not location:
+            raise CacheConfigError(f'Не указан каталог кэша: {url!r}')
+    elif parts.scheme == 'memcached':
+        location = parts.netloc
+    else:
+        location = url
+    return {'BACKEND': backend, 'LOCATION': location}
+
+
+def caches_from_env(environ):
+    """CACHES: TieredCache перед общим кэшем под псевдонимом shared."""
+    max_entries = environ.get(
+        'CACHE_LOCAL_MAX_ENTRIES', DEFAULT_LOCAL_MAX_ENTRIES
+    )
+    try:
+        max_entries = int(max_entries)
+    except ValueError as error:
+        raise CacheConfigError(
+            f'CACHE_LOCAL_MAX_ENTRIES должен быть числом: {max_entries!r}'
+        ) from error
+    return {
+        'default': {
+            'BACKEND': 'core.cache.TieredCache',
+            'OPTIONS': {
+                'SHARED': 'shared',
+                'LOCAL_PREFIXES': LOCAL_PREFIXES,
+                'LOCAL_MAX_ENTRIES': max_entries,
+                'LOCAL_TIMEOUT': DEFAULT_LOCAL_TIMEOUT,
+            },
+        },
+        'shared': parse_cache_url(environ.get('CACHE_URL') or 'locmem://'),
+    }
@@ -0,0 +1,95 @@
+"""Настройки DATABASES из переменных окружения.
+
+DATABASE_URL — основная база, например
+postgres://user:password@db:5432/yatube?sslmode=require;
+по умолчанию SQLite в BASE_DIR/db.sqlite3.
+DATABASE_REPLICA_URLS — адреса реплик через запятую, они получают
+псевдонимы replica1, replica2 и т. д.
+DATABASE_CONN_MAX_AGE — сколько секунд держать соединение открытым,
+пустое значение — без ограничения.
+DATABASE_POOL=pgbouncer — соединения идут через пул pgbouncer
+в режиме транзакций, серверные курсоры при этом отключаются.
+"""
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+ENGINES = {
+    'postgres': 'django.db.backends.postgresql',
+    'postgresql': 'django.db.backends.postgresql',
+    'pgsql': 'django.db.backends.postgresql',
+    'mysql': 'django.db.backends.mysql',
+    'sqlite': 'django.db.backends.sqlite3',
+}
+
+POOL_MODES = ('', 'pgbouncer')
+
+DEFAULT_CONN_MAX_AGE = 60
+
+
+class DatabaseConfigError(ValueError):
+    pass
+
+
+def parse_conn_max_age(value, engine):
+    if value is None:
+        return 0 if engine == ENGINES['sqlite'] else DEFAULT_CONN_MAX_AGE
+    if value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError as error:
+        raise DatabaseConfigError(
+            f'DATABASE_CONN_MAX_AGE должен быть числом: {value!r}'
+        ) from error
+
+
+def parse_database_url(url, conn_max_age=None, pool=''):
+    """Словарь настроек одной базы по её адресу."""
+    parts = urlsplit(url)
+    engine = ENGINES.get(parts.scheme)
+    if engine is None:
+        raise DatabaseConfigError(f'Неизвестная схема базы: {url!r}')
+    if pool not in POOL_MODES:
+        raise DatabaseConfigError(f'Неизвестный режим пула: {pool!r}')
+    if engine == ENGINES['sqlite']:
+        return {
+            'ENGINE': engine,
+            'NAME': unquote(parts.path[1:]) or ':memory:',
+            'CONN_MAX_AGE': parse_conn_max_age(conn_max_age, engine),
+        }
+    config = {
+        'ENGINE': engine,
+        'NAME': unquote(parts.path[1:]),
+        'USER': unquote(parts.username or ''),
+        'PASSWORD': unquote(parts.password or ''),
+        'HOST': parts.hostname or '',
+        'PORT': str(parts.port or ''),
+        'CONN_MAX_AGE': parse_conn_max_age(conn_max_age, engine),
+        'OPTIONS': dict(parse_qsl(parts.query)),
+    }
+    if pool == 'pgbouncer':
+        # В режиме транзакций pgbouncer курсоры не переживают COMMIT.
+        config['DISABLE_SERVER_SIDE_CURSORS'] = True
+    return config
+
+
+def databases_from_env(environ, default_url):
+    """DATABASES и список псевдонимов реплик."""
+    conn_max_age = environ.get('DATABASE_CONN_MAX_AGE')
+    pool = environ.get('DATABASE_POOL', '')
+    databases = {
+        'default': parse_database_url(
+            environ.get('DATABASE_URL') or default_url, conn_max_age, pool
+        ),
+    }
+    replica_urls = [
+        url.strip()
+        for url in environ.get('DATABASE_REPLICA_URLS', '').split(',')
+        if url.strip()
+    ]
+    replicas = []
+    for number, url in enumerate(replica_urls, start=1):
+        alias = f'replica{number}'
+        databases[alias] = parse_database_url(url, conn_max_age, pool)
+        databases[alias]['TEST'] = {'MIRROR': 'default'}
+        replicas.append(alias)
+    return databases, replicas
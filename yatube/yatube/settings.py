@@ -1,5 +1,8 @@
 import os
 
+from .caches import caches_from_env
+from .databases import databases_from_env
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -28,6 +31,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -38,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryBudgetMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,13 +78,57 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+DATABASES, DATABASE_REPLICAS = databases_from_env(
+    os.environ, 'sqlite:///' + os.path.join(BASE_DIR, 'db.sqlite3')
+)
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Представления, которые читают из реплик. Остальные запросы и любые
+# запросы с записью идут в основную базу.
+DATABASE_REPLICA_VIEWS = {
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+    'posts:post_search',
+    'posts:tag_posts',
+    'posts:mentions',
+    'posts:follow_index',
+    'api:post_list',
+    'api:post_detail',
+    'api:post_comments',
+    'api:group_list',
+    'api:group_posts',
+    'api:profile_detail',
+    'api:profile_posts',
+    'api:follow_feed',
+}
+
+# Сколько секунд после записи клиент читает из основной базы,
+# чтобы увидеть свои изменения несмотря на отставание реплик.
+DATABASE_PRIMARY_STICKY_SECONDS = 5
+
+# Наибольшее ожидаемое отставание реплик: столько секунд после изменения
+# ленты её страницы читаются из основной базы (см. posts.http_cache).
+DATABASE_REPLICA_LAG_SECONDS = 5
+
+# Применяются к каждому новому соединению с SQLite (см. core.sqlite).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 2 ** 20,
+    'cache_size': -64 * 2 ** 10,
+    'busy_timeout': 5000,
 }
 
+SQLITE_SERIALIZE_WRITES: bool = True
+
+SQLITE_WRITE_RETRIES: int = 5
+
+SQLITE_RETRY_DELAY: float = 0.05
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -122,6 +172,19 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 POSTS_PER_PAGE: int = 10
 
+COMMENTS_PER_PAGE: int = 20
+
+FEED_COUNT_TIMEOUT: int = 60 * 60
+
+FEED_CACHE_TIMEOUT: int = 60 * 60 * 6
+
+POST_CARD_TIMEOUT: int = 60 * 60 * 24
+
+TIMELINE_FANOUT_LIMIT: int = 1000
+
+# Сколько записей ленты подписок писать за одну вставку при подписке.
+TIMELINE_BACKFILL: int = 500
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
@@ -132,10 +195,73 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-}
+CACHES = caches_from_env(os.environ)
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+QUERY_BUDGETS = {
+    'posts:index': 6,
+    'posts:group_list': 7,
+    'posts:profile': 7,
+    'posts:post_detail': 6,
+    'posts:post_comments': 3,
+    'posts:post_search': 6,
+    'posts:tag_posts': 7,
+    'posts:mentions': 7,
+    'posts:follow_index': 7,
+    'posts:post_create': 12,
+    'posts:post_edit': 12,
+    'posts:add_comment': 10,
+    'posts:profile_follow': 13,
+    'posts:profile_unfollow': 10,
+    'api:post_list': 2,
+    'api:post_detail': 1,
+    'api:post_comments': 2,
+    'api:group_list': 1,
+    'api:group_posts': 2,
+    'api:profile_detail': 1,
+    'api:profile_posts': 2,
+    'api:follow_feed': 5,
+}
+
+QUERY_BUDGET_STRICT: bool = False
+
+HTTP_CACHE_MAX_AGE = {
+    'posts:index': 60,
+    'posts:group_list': 60,
+    'posts:profile': 60,
+    'posts:post_detail': 60,
+}
+
+QUERY_REPORT_FILE = None
+
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+THUMBNAIL_WORKERS = 2
+
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+
+THUMBNAIL_LRU_SIZE = 2048
+
+POST_IMAGE_WIDTHS = (320, 640, 960)
+
+POST_IMAGE_FORMATS = ('avif', 'webp')
+
+POST_IMAGE_QUALITY = 80
+
+# Сколько секунд после загрузки картинка не удаляется, даже если на неё
+# ещё не ссылается ни один пост (см. posts.storage). Такие картинки
+# удаляет позже команда cleanup_images.
+POST_IMAGE_REUSE_GRACE = 60
+
+POST_IMAGE_MAX_BYTES = 10 * 2 ** 20
+
+# JPEG декодируется сразу в уменьшенном масштабе, остальные форматы —
+# целиком, поэтому для них предел пикселей ниже.
+POST_IMAGE_MAX_PIXELS = 25 * 10 ** 6
+
+POST_IMAGE_MAX_DECODED_PIXELS = 10 ** 7
+
+POST_IMAGE_MAX_SIDE = 2560